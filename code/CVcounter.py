@@ -1,43 +1,162 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import regex as re
+import re
+from collections import Counter, deque
+from functools import lru_cache
+
+import numpy as np
+
+import corpusindex as ci
+import ldreader as ldr
 
 '''
 a module for counting various CV patterns in a .txt file. The file should have one word per line, with segments separated by spaces. Needs a list of vowels, "vs", to function.
+
+every word is turned into its CV skeleton, coded as bytes (C = 0, V = 1), and words with the same skeleton are only counted once. plain patterns ('C V C', 'V V') are all counted together by one automaton that scans each skeleton once and finds every occurrence of every pattern, overlapping ones included. anything else in a pattern is taken as a regular expression over the skeleton written out as 'C V C ...', as before.
 '''
 
-def countCVC(**kwargs):
+C = 0
+V = 1
+#a pattern made only of C and V, separated by spaces
+PLAIN = re.compile(r'[CV]( [CV])*$')
+
+
+class CVAutomaton:
+    '''
+    an Aho-Corasick automaton for a list of plain CV patterns, like ['C V C', 'V V'].
+    goto[state][symbol] is the next state (for C = 0 and V = 1), with the failure links already folded in, and out[state] lists the patterns that end in that state
+    '''
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        goto = [[-1, -1]]
+        out = [[]]
+        for (k, pattern) in enumerate(self.patterns):
+            state = 0
+            for sym in encode(pattern):
+                if goto[state][sym] < 0:
+                    goto[state][sym] = len(goto)
+                    goto.append([-1, -1])
+                    out.append([])
+                state = goto[state][sym]
+            out[state].append(k)
+        #breadth first, so that the state a failure link points to is finished before the states that use it
+        fail = [0]*len(goto)
+        queue = deque()
+        for sym in (C, V):
+            if goto[0][sym] < 0:
+                goto[0][sym] = 0
+            else:
+                queue.append(goto[0][sym])
+        while queue:
+            state = queue.popleft()
+            out[state] = out[state] + out[fail[state]]
+            for sym in (C, V):
+                nxt = goto[state][sym]
+                if nxt < 0:
+                    goto[state][sym] = goto[fail[state]][sym]
+                else:
+                    fail[nxt] = goto[fail[state]][sym]
+                    queue.append(nxt)
+        self.goto = goto
+        self.out = out
+
+    def count(self, skeleton):
+        '''
+        skeleton is a CV skeleton as bytes (or any sequence of 0s and 1s). returns a list with the number of times each pattern occurs in it
+        '''
+        counts = [0]*len(self.patterns)
+        goto = self.goto
+        out = self.out
+        state = 0
+        for sym in skeleton:
+            state = goto[state][sym]
+            for k in out[state]:
+                counts[k] += 1
+        return counts
+
+
+@lru_cache(maxsize=32)
+def automaton(patterns):
+    '''
+    the CVAutomaton for a tuple of plain patterns, made once
+    '''
+    return CVAutomaton(patterns)
+
+
+def encode(pattern):
+    return [V if x == 'V' else C for x in pattern.split(' ')]
+
+
+def spell(skeleton):
     '''
-    path is a path to a LearningData.txt file (or similar)
+    a skeleton written out the way the regular expressions see it: 'C V C'
     '''
-    ld = kwargs['ld']
-    searchseqs = kwargs['searchseqs']
-    vs = kwargs['vs']
+    return ' '.join('V' if x else 'C' for x in skeleton)
+
+
+def parse_seqs(searchseqs):
+    '''
+    searchseqs is a list of patterns, or a string of them separated by commas or newlines (or just one pattern)
+    '''
+    if not isinstance(searchseqs, str):
+        return [x.strip() for x in searchseqs]
     if ',' in searchseqs:
-        seqs = [x.strip() for x in searchseqs.split(",")]
+        return [x.strip() for x in searchseqs.split(",")]
     elif "\n" in searchseqs:
-        seqs = [x.strip() for x in searchseqs.split("\n")]
-    if type(vs) == str:
-        vowels = vs.split(' ')
-    elif type(vs)==list:
-        vowels = vs
-#    print('the vowels are: ' + ' '.join(vowels))
-    CVdic = {}.fromkeys(seqs, 0)
-    with open(ld, 'r', encoding='utf-8') as f:
-        for line in f:
-            word = line.rstrip("\n").split(" ")
-            CVword = []
-            for i in range(len(word)):
-                if word[i] in vowels:
-                    CVword.append("V")
-                else:
-                    CVword.append("C")
-            CVword = ' '.join(CVword)
-            for seq in CVdic:
-                #to count overlapped instances of CVC in every word
-                #special module (not overwrought regex)
-                matches = re.findall(seq, CVword, overlapped=True)
-                n = len(matches)
-                CVdic[seq]+=n
+        return [x.strip() for x in searchseqs.split("\n")]
+    return [searchseqs.strip()]
+
+
+def skeletons(ld, vs):
+    '''
+    the CV skeletons of every word in ld, as a Counter {skeleton bytes: number of words with it}.
+    ld is a path to a LearningData.txt file, a compiled corpus or a corpusindex.CorpusIndex; vs is a list of vowels or a space-separated string.
+    for a corpus index, all the skeletons come from one lookup over its token array. the result can be handed to countCVC as skeletons=, so the corpus is not read again for more patterns
+    '''
+    vowels = vs.split(' ') if isinstance(vs, str) else vs
+    if isinstance(ld, ci.CorpusIndex) or ci.is_compiled(ld):
+        corpus = ci.load(ld)
+        isvowel = (corpus.lookup(vowels) >= 0).astype(np.uint8)
+        data = isvowel[corpus.tokens].tobytes()
+        offs = corpus.offsets.tolist()
+        return Counter(data[offs[i]:offs[i+1]] for i in range(len(offs)-1))
+    vowels = set(vowels)
+    return Counter(bytes(V if x in vowels else C for x in word) for word in ldr.words(ld))
+
+
+def count_skeletons(CVdic, shapes):
+    '''
+    adds the counts of every pattern in CVdic over shapes (a Counter of skeletons, from skeletons()) to CVdic.
+    plain patterns go through one automaton; the others are regular expressions, with every overlapping match counted
+    '''
+    plain = tuple(seq for seq in CVdic if PLAIN.match(seq))
+    other = [(seq, re.compile('(?=('+seq+'))')) for seq in CVdic if not PLAIN.match(seq)]
+    machine = automaton(plain) if plain else None
+    for (shape, n) in shapes.items():
+        if machine is not None:
+            for (seq, k) in zip(plain, machine.count(shape)):
+                CVdic[seq] += n*k
+        if other:
+            CVword = spell(shape)
+            for (seq, pattern) in other:
+                CVdic[seq] += n*sum(1 for x in pattern.finditer(CVword))
     return CVdic
+
+
+def countCVC(**kwargs):
+    '''
+    ld is a path to a LearningData.txt file (or similar), a compiled corpus, or a corpusindex.CorpusIndex
+    searchseqs is a list of patterns, or a string of them separated by commas or newlines: 'C V C, V V, C C'
+    vs is the list of vowels (or a space-separated string)
+    if the skeletons have already been made (see skeletons()), pass them as skeletons=, and ld and vs are not needed
+    returns {pattern: number of occurrences}, overlapping occurrences included
+    '''
+    seqs = parse_seqs(kwargs['searchseqs'])
+    if 'skeletons' in kwargs:
+        shapes = kwargs['skeletons']
+    else:
+        shapes = skeletons(kwargs['ld'], kwargs['vs'])
+    CVdic = {}.fromkeys(seqs, 0)
+    return count_skeletons(CVdic, shapes)
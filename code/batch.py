@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+runs the complex segment learner on many languages at once.
+
+every directory under data/ that has both a LearningData.txt and a Features.txt file is a job (simulation folders are skipped), unless a manifest file lists the jobs instead: one directory per line, relative to data/ or absolute, with # for comments.
+
+the jobs run in a pool of worker processes, one per CPU by default. each job does what
+
+$ python3 compseg.py --language=english/cmu/broad
+
+does (except for plotting, unless you ask for it), and a failed job does not stop the others.
+at the end, a summary table is written with the complex segments found in each language, in the same layout as data/metadata.txt, plus the wall time and status of each job.
+
+usage:
+
+$ python3 batch.py
+$ python3 batch.py --manifest=nightly.txt --workers=8 --out=/home/you/summary.txt
+
+or, from python:
+
+>>> import batch
+>>> results = batch.run_batch(batch.discover('/home/you/compsegcode/data'))
+'''
+
+import os
+import sys
+import time
+import contextlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import messages as msg
+
+
+def discover(datadir):
+    '''
+    returns {language: full path} for every directory under datadir that has LearningData.txt and Features.txt.
+    language is the path relative to datadir, e.g. 'english/cmu/broad'
+    '''
+    jobs = {}
+    for (dirpath, dirnames, filenames) in os.walk(datadir):
+        #learner output has its own LearningData.txt and Features.txt files
+        dirnames[:] = sorted(x for x in dirnames if not x == 'simulation')
+        if 'LearningData.txt' in filenames and 'Features.txt' in filenames:
+            lang = os.path.relpath(dirpath, datadir).replace(os.path.sep, '/')
+            jobs[lang] = dirpath
+    return jobs
+
+
+def read_manifest(manifestpath, datadir):
+    '''
+    returns {language: full path} for the directories listed in the manifest file, one per line
+    '''
+    jobs = {}
+    with open(manifestpath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            if os.path.isabs(line):
+                jobs[line] = line
+            else:
+                jobs[line] = os.path.join(datadir, line)
+    return jobs
+
+
+def run_job(lang, lgpath, threshold=1.0, alpha=0.05, plot=False):
+    '''
+    runs complexify on one language directory, with the simulation folder saved inside it. an up-to-date compiled corpus (LearningData.corpus) is used instead of LearningData.txt if there is one
+    returns a dictionary: language, status ('ok' or 'failed'), seconds, segments (the complex segments that were added to the inventory), error
+    '''
+    #imported here so that the parent process does not need to
+    import compseg
+    import corpusindex as ci
+    import pynatclasses as pnc
+    result = {'language': lang, 'status': 'ok', 'seconds': 0.0, 'segments': [], 'error': ''}
+    start = time.time()
+    try:
+        feats = os.path.join(lgpath, 'Features.txt')
+        oldsegs = [line[0] for line in pnc.read_feat_file(feats)[1]]
+        #the learner talks a lot; the report still goes to simulation_report.txt
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            #workers that load the same compiled corpus share its memory-mapped pages
+            out = compseg.complexify(ld=ci.prefer_compiled(os.path.join(lgpath, 'LearningData.txt')), feats=feats, outdir=lgpath, threshold=threshold, alpha=alpha, inmemory=True, artifacts='sync')
+            if isinstance(out, str) or out is None:
+                raise RuntimeError('the feature file did not pass the feature check')
+            if plot:
+                simpath = os.path.join(lgpath, 'simulation')
+                compseg.plot_insep(simpath, ftype='png')
+                compseg.plot_insep(simpath, ftype='pdf')
+        result['segments'] = [line[0] for line in out[0][1] if not line[0] in oldsegs]
+    except (Exception, SystemExit) as e:
+        result['status'] = 'failed'
+        result['error'] = ''.join(traceback.format_exception_only(type(e), e)).strip()
+    result['seconds'] = time.time()-start
+    return result
+
+
+def run_batch(jobs, workers=None, threshold=1.0, alpha=0.05, plot=False, **kwargs):
+    '''
+    jobs is {language: path}, from discover or read_manifest
+    runs all the jobs in a process pool with workers processes (default: one per CPU), and reports each one as it finishes.
+    returns a list of result dictionaries (see run_job), sorted by language
+    '''
+    if not workers:
+        workers = os.cpu_count() or 1
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, lang, jobs[lang], threshold, alpha, plot): lang for lang in sorted(jobs)}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                #the worker process itself died
+                result = {'language': futures[future], 'status': 'failed', 'seconds': 0.0, 'segments': [], 'error': repr(e)}
+            results.append(result)
+            line = f"\n{result['language']}\t{result['status']}\t{result['seconds']:.1f}s\t{', '.join(result['segments']) or 'none'}"
+            if result['error']:
+                line += f"\t{result['error']}"
+            msg.env_render(message=line, **kwargs)
+    return sorted(results, key=lambda x: x['language'])
+
+
+def write_summary(results, outpath):
+    '''
+    writes a tab-separated table, one line per language: the complex segments found, the wall time, and the status
+    '''
+    with open(outpath, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(['language', 'complex_segments', 'seconds', 'status'])+'\n')
+        for result in results:
+            status = result['status'] if not result['error'] else result['status']+': '+result['error'].replace('\t', ' ').replace('\n', ' ')
+            f.write('\t'.join([result['language'], ', '.join(result['segments']) or 'none', f"{result['seconds']:.2f}", status])+'\n')
+
+
+if __name__=='__main__':
+    import argparse
+    datadir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    parser = argparse.ArgumentParser(description='runs the complex segment learner on every language directory under data/ (or the ones listed in a manifest) in parallel, and writes a summary table.')
+    parser.add_argument('--data', help='the directory to search for LearningData.txt and Features.txt files', default=datadir)
+    parser.add_argument('--manifest', help='a file listing the directories to run, one per line, relative to --data or absolute')
+    parser.add_argument('--workers', help='number of worker processes (default: one per CPU)', type=int, default=None)
+    parser.add_argument('--threshold', help='threshold value for inseparability', type=float, default=1.0)
+    parser.add_argument('--alpha', help="alpha value for Fisher's Exact Test", type=float, default=0.05)
+    parser.add_argument('--plot', help='also plot the inseparability values for each language', action='store_true')
+    parser.add_argument('--out', help='where to write the summary table (default: batch_summary.txt in --data)')
+    args = parser.parse_args()
+    if args.manifest:
+        jobs = read_manifest(args.manifest, args.data)
+    else:
+        jobs = discover(args.data)
+    msg.env_render(message=f'\nRunning {len(jobs)} jobs...')
+    results = run_batch(jobs, workers=args.workers, threshold=args.threshold, alpha=args.alpha, plot=args.plot)
+    outpath = args.out or os.path.join(args.data, 'batch_summary.txt')
+    write_summary(results, outpath)
+    failed = [x['language'] for x in results if not x['status']=='ok']
+    msg.env_render(message=f'\n\nWrote summary to {outpath}. {len(results)-len(failed)} jobs finished, {len(failed)} failed.\n')
+    if failed:
+        sys.exit(1)
@@ -22,7 +22,6 @@ Or, import the module into python and invoke help there:
 #standard modules
 import os 
 import sys 
-from re import sub as resub
 import shutil
 
 
@@ -31,7 +30,10 @@ import shutil
 import pynatclasses as pnc
 import natclasscounter as nc
 import datachecker as dc
-import plot_insep as pins
+import corpusindex as ci
+import ngramcounter as ngc
+import writebehind as wb
+import rewriter as rw
 import messages as msg
 
 
@@ -43,7 +45,10 @@ def old_feats(featfilepath, **kwargs):
     '''
     given a path to features.txt, returns
     (featurenames, segmentlines)
+    if featfilepath is a (featurenames, segmentlines) tuple already, returns a copy of it that can be changed safely
     '''
+    if isinstance(featfilepath, (tuple, list)):
+        return (list(featfilepath[0]), [list(line) for line in featfilepath[1]])
     return pnc.read_feat_file(featfilepath, **kwargs)
 
 
@@ -52,6 +57,7 @@ def get_bidir_transprobs(featpath, datapath, **kwargs):
     calculates the likelihood of any two segments preceding and following each other
     either as bidirectional transitional probabilities or using the inseparability measure
     returns a dictionary of seqs and numbers referred to in other functions as "clusters"
+    datapath can be a path to LearningData.txt or a corpusindex.CorpusIndex
     '''
     return nc.bidir_prob_wrapper(featpath, datapath, **kwargs)
 
@@ -59,10 +65,10 @@ def find_diff_feats(clusters, featpath, threshold=1, **kwargs):
     '''
     finds features that two segs in a bigram share, and features that two segs in a bigram differ on. 
     takes as input a dictionary of bidirectional transitional probabilities.
-    needs a path to the features file, Features.txt
+    needs a path to the features file, Features.txt, or the (featurenames, segmentlines) tuple read from one
     the threshold value determines which ngrams are considered. by default, only clusters whose bidirectional trans prob is equal or greater than 1 will be analyzed.
     '''
-    segdic = pnc.segs_to_feats(pnc.read_feat_file(featpath, **kwargs), **kwargs)
+    segdic = pnc.segs_to_feats(old_feats(featpath, **kwargs), **kwargs)
     ngramlist = [x for x in clusters if clusters[x]>=threshold]
     differ = {}.fromkeys(ngramlist, [])
     same = {}.fromkeys(ngramlist, [])
@@ -265,6 +271,7 @@ def write_new_feats(outpath, featlist):
         f.write("\t" + "\t".join(featlist[0])+'\n')
         for line in featlist[1]:
             f.write('\t'.join(line) + '\n')
+    pnc.invalidate(outpath)
 
 
 def write_new_ld_file(clusters, oldpath, newpath, threshold=1, **kwargs):
@@ -274,29 +281,27 @@ def write_new_ld_file(clusters, oldpath, newpath, threshold=1, **kwargs):
     threshold defaults to 1 (inseparability measure)
     bigram clusters are sorted by their inseparability value;
     thus, if something that eventually becomes a trigram or tetragram has two-way parts in the current inseparability table, the bigram that is higher on the list will be replaced first.
+    all the clusters are merged in one pass over each line (see rewriter); tab columns are kept
+    to merge clusters in learning data that is already in memory, use merge_clusters
     '''
     clustlist = sorted([x for x in clusters if clusters[x]>=threshold], key=clusters.get, reverse=True)
-    with open(oldpath, 'r', encoding='utf-8') as f:
-        with open(newpath, 'w', encoding='utf-8') as out:
-            for line in f:
-                word = line.strip()
-                if '\t' in line:
-                    word = line.split('\t')[0]
-                    rest = line.split('\t')[1:]
-                for clust in clustlist: 
-                    x = r'(^|\s)'+(clust)+r'(\s|$)'
-                    y = r'\1'+''.join(clust.split(" "))+r'\2'
-                    word = resub(x, y, word)
-                if '\t' in line:
-                    out.write(f"word\trest")
-                else:
-                    out.write(word +'\n')
+    changed = rw.ClusterRewriter(clustlist).rewrite_file(oldpath, newpath)
     msg.env_render(message=f"\n\nWrote modified learning data to {newpath.split('simulation')[1]}", **kwargs)
+    return changed
                             
 
+def merge_clusters(clusters, counts, threshold=1, **kwargs):
+    '''
+    the in-memory counterpart of write_new_ld_file: merges the clusters into complex segments in an ngramcounter.RunningCounts, in order of inseparability, and updates its counts. nothing is written.
+    returns the number of words that changed
+    '''
+    clustlist = sorted([x for x in clusters if clusters[x]>=threshold], key=clusters.get, reverse=True)
+    return counts.merge(clustlist)
+
+
 def check_new_segs(newpath, oldfeats, newfeats, **kwargs): 
     '''
-    given an interim data file, checks to see which segs from old feats are no longer in the new data.
+    given an interim data file (a path or a corpusindex.CorpusIndex), checks to see which segs from old feats are no longer in the new data.
     also checks which segs from the new feature file are not in the new data, because that can happen if the complex segment is really a trigram:
     old data:
     d z
@@ -321,35 +326,41 @@ def check_new_segs(newpath, oldfeats, newfeats, **kwargs):
         msg.env_render(**kwargs)
         return (False, False) 
 
+def feats_w_check(datapath, oldfeats, newfeats, skipcheck=False, **kwargs):
+    '''
+    checks the data against a new feature list (newfeats). this is a collection of featlines.
+    if any segs are extra, returns the featlines without them; otherwise returns newfeats as is.
+    this is what write_feats_w_check writes, and what the next iteration of complexify works with
+    '''
+    segs=None
+    if not skipcheck:
+        segs = check_new_segs(datapath, oldfeats, newfeats, **kwargs)
+    if segs and segs[1]=='extra':
+        return (newfeats[0], [line for line in newfeats[1] if not line[0] in segs[0]])
+    return newfeats
+
 def write_feats_w_check(newfeatpath, datapath, oldfeats, newfeats, skipcheck=False, **kwargs): 
     '''
     checks the data file against a new feature list (newfeats). this is a collection of featlines.
     if any segs are missing, raises an error and exits
     if any segs are extra, writes all but the extra segs to newfeatpath. 
+    returns the featlines that were written
     '''
-    segs=None
-    if not skipcheck:
-        segs = check_new_segs(datapath, oldfeats, newfeats, **kwargs)
-    with open(newfeatpath, 'w', encoding='utf-8') as f:
-        f.write('\t'+'\t'.join(newfeats[0])+'\n')
-        for line in newfeats[1]:
-            if segs and segs[1]=='extra':
-                if line[0] in segs[0]:
-                    pass
-                else:
-                    f.write('\t'.join(line)+'\n')
-            else:
-                f.write('\t'.join(line)+'\n')
-    return(newfeats) #just a path
+    finalfeats = feats_w_check(datapath, oldfeats, newfeats, skipcheck, **kwargs)
+    write_new_feats(newfeatpath, finalfeats)
+    return finalfeats
 
 def complexify(**kwargs):
     '''
     the algorithm.
     feats is a full path to Features.txt or another appropriately formatted feature file
-    ld is a full path to a LearningData.txt or other learning data file, with space-separated words
+    ld is a full path to a LearningData.txt or other learning data file, with space-separated words, or to a corpus compiled from one (see corpusindex)
     outdir is a writable directory where the learner will save results.
     the function creates a subfolder inside this directory, called 'simulation', and creates new versions of learning data and features. NOTE: any existing simulation directories will be deleted without warning.
     threshold is the cutoff for the inseparability measure. clusters above the threshold get converted into complex segments. defaults to 1.
+    the data and features are kept in memory from one iteration to the next; the files in each iteration folder are a record, and the artifacts argument decides when they are written:
+        'sync' (the default) writes them as each iteration finishes; 'thread' writes them in a background thread; 'end' writes them all after the last iteration; None does not write them. the report is always written.
+    inmemory=True returns the final (featurenames, segmentlines) and the final ngramcounter.RunningCounts instead of None, and makes artifacts default to None. an inmemory run that writes no artifacts leaves outdir/simulation as it is, and its report stays in outdir/simulation_report.txt.
     '''
     if not 'vowels' in kwargs:
         vowels=False
@@ -360,6 +371,8 @@ def complexify(**kwargs):
     outdir=kwargs.get('outdir')
     threshold = kwargs.get('threshold')
     alpha = kwargs.get('alpha')
+    inmemory = kwargs.get('inmemory', False)
+    artifacts = kwargs.get('artifacts', None if inmemory else 'sync')
     ofpth = os.path.join(outdir, 'simulation_report.txt')
     kwargs['outfilepath']=ofpth
     msg.env_render(message="\nSearching for complex segments.", **kwargs)
@@ -380,19 +393,23 @@ def complexify(**kwargs):
         if __name__=='__main__':
             raise SystemExit
     elif pnc.check_feats(oldfeats, **kwargs):
-        if os.path.isdir(os.path.join(outdir, 'simulation')):
-            shutil.rmtree(os.path.join(outdir, 'simulation'))
-        os.mkdir(os.path.join(outdir, 'simulation'))
+        simdir = os.path.join(outdir, 'simulation')
+        writesim = bool(artifacts) or not inmemory
+        if writesim:
+            if os.path.isdir(simdir):
+                shutil.rmtree(simdir)
+            os.mkdir(simdir)
+        #the data is read once; after that, the counts are kept in memory and only the rewritten words are recounted
+        corpus = ngc.RunningCounts.from_corpus(ld)
+        featlines = oldfeats
+        writer = wb.IterationWriter(artifacts)
         step = 1
         while step:
-            wdir = os.path.join(outdir, 'simulation', 'iteration'+str(step))
-            os.mkdir(wdir)
-            #get numbers from feats and ld files
-            temp = get_bidir_transprobs(feats, ld, **kwargs)
-            if temp[0]=={}:
-                shutil.rmtree(wdir)
-            else:
-                nc.write_insep(temp, os.path.join(wdir, 'inseparability.txt'))
+            wdir = os.path.join(simdir, 'iteration'+str(step))
+            #get numbers from feats and ld
+            temp = get_bidir_transprobs(featlines, corpus, **kwargs)
+            if not temp[0]=={}:
+                writer.write(os.path.join(wdir, 'inseparability.txt'), _write_insep_rows, temp)
             clusters = {k:v for (k,v) in temp[0].items() if temp[0][k]>=threshold}
             #fisher's test check to avoid unifying clusters that are too infrequent
             for c in clusters.copy():
@@ -404,19 +421,27 @@ def complexify(**kwargs):
                 msg.env_render(message="\n\nSimulation Finished", **kwargs)
                 step = 0
             else:
-                nc.write_insep(temp, os.path.join(wdir, 'inseparability.txt'))
                 msg.tab_render(d=clusters, message=f'\nFound complex segments on iteration {step}:\n', **kwargs)
-                newfeats = make_new_feats(feats, get_new_segs(feats, clusters, **kwargs)) 
+                newfeats = make_new_feats(featlines, get_new_segs(featlines, clusters, **kwargs)) 
                 msg.env_render(message="\nChecking learner-generated feature file...\n", **kwargs)
                 if not pnc.check_feats(newfeats, **kwargs):
                     msg.env_render(message = msg.messages['badfeatswarning'], **kwargs)
-                write_new_ld_file(clusters, ld, os.path.join(wdir, 'LearningData.txt'), **kwargs)
-                write_feats_w_check(os.path.join(wdir, 'Features.txt'), os.path.join(wdir, 'LearningData.txt'), oldfeats, newfeats, **kwargs)
+                merge_clusters(clusters, corpus, **kwargs)
+                newld = os.path.join(wdir, 'LearningData.txt')
+                if artifacts:
+                    #the word list is copied, because the next iteration replaces words in it
+                    writer.write(newld, ngc.write_words, list(corpus.words), corpus.tails)
+                    msg.env_render(message=f"\n\nWrote modified learning data to {newld.split('simulation')[1]}", **kwargs)
+                featlines = feats_w_check(corpus, oldfeats, newfeats, **kwargs)
+                writer.write(os.path.join(wdir, 'Features.txt'), write_new_feats, featlines)
                 msg.env_render(message=f"\nExamining data from iteration {step}.\n", **kwargs)
-                ld= os.path.join(wdir, 'LearningData.txt')
-                feats = os.path.join(wdir, 'Features.txt') 
+                ld = newld
                 step+=1
-        shutil.move(ofpth, os.path.join(outdir, 'simulation', 'simulation_report.txt'))
+        writer.close()
+        if writesim:
+            shutil.move(ofpth, os.path.join(simdir, 'simulation_report.txt'))
+        if inmemory:
+            return (featlines, corpus)
         return None
     else: #failed feature check on first pass, cannot proceed
         if __name__=="__main__":
@@ -428,11 +453,20 @@ def complexify(**kwargs):
             return "Your feature file does not allow segments to be distinguished from each other. Perhaps try again with <a href='media/generic/Features.txt'>this generic feature file</a>?.<br>Here is how far the learner got:<br>"+errors
     
 
+def _write_insep_rows(outpath, d):
+    '''
+    nc.write_insep with the path first, the way writebehind jobs are called
+    '''
+    nc.write_insep(d, outpath)
+
+
 def plot_insep(simpath, threshold=1, takefirst=15, show=False, ftype='pdf'):
     '''
     searches contents of insepath for inseparability.txt files, and produces plots of them.
     saves each in the same location as the inseparability.txt file it represents.
     '''
+    #matplotlib is slow to import, and only needed here
+    import plot_insep as pins
     try:
         pins.plot_all_vert(simpath, threshold, takefirst, show, ftype)
         msg.env_render(message=f'\n {ftype.upper()} Plot generated for {simpath}')
@@ -446,18 +480,21 @@ def plot_insep(simpath, threshold=1, takefirst=15, show=False, ftype='pdf'):
 if __name__=='__main__':
     import argparse
     parser= argparse.ArgumentParser(description=msg.messages['help'])
-    parser.add_argument('--ld', help="full path to learning data file")
+    parser.add_argument('--ld', help="full path to learning data file, or to a compiled corpus directory (see corpusindex.py)")
     parser.add_argument('--feats', help="full path to feature file")
     parser.add_argument('--outdir', help='full path to the location of output files. Warning: any folder called "simulation" in that location will be overwritten without a prompt.')
     parser.add_argument('--vowels', help='makes the learner count vocoids rather than consonants', type=bool, default=False)
     parser.add_argument('--language', help='if only this argument is specified, the learner will look for an appropriately named folder within "data" (located at the same level as "code") and will run the simulation on the learning data and features files inside that folder. For example, python compseg.py --lang=english/celex/broad runs the learner on the learning data and features inside ../data/english/celex/broad')
     parser.add_argument('--threshold', help='threshold value for inseparability', nargs='?', const=1.0, type=float, default=1.0)
     parser.add_argument('--alpha', help="alpha value for Fisher's Exact Test", nargs='?', const=0.05, type=float, default=0.05)
+    parser.add_argument('--pvalues', help="which p-values to compute for inseparability.txt: 'lazy' (all of them, but only those of clusters above the threshold before the clusters are chosen), 'all' (all of them up front), 'none' (only those of clusters above the threshold; the rest are NA)", choices=['lazy', 'all', 'none'], default='lazy')
+    parser.add_argument('--artifacts', help="when to write the files in each iteration folder: 'sync' (as each iteration finishes), 'thread' (in the background), 'end' (after the last iteration)", choices=['sync', 'thread', 'end'], default='sync')
     args=parser.parse_args()
     kwargs = vars(args)
     if args.language:
         lgpath = os.path.join(os.path.dirname(os.getcwd()), 'data', args.language)
-        kwargs['ld'] = os.path.join(lgpath, 'LearningData.txt')
+        #a compiled corpus is used if there is an up-to-date one next to LearningData.txt
+        kwargs['ld'] = ci.prefer_compiled(os.path.join(lgpath, 'LearningData.txt'))
         kwargs['feats'] = os.path.join(lgpath, 'Features.txt')
         kwargs['outdir']=lgpath
         simpath = os.path.join(lgpath, 'simulation')
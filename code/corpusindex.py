@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+a module that reads a Hayes-and-Wilson-formatted LearningData.txt file once and keeps it in memory as integer segment IDs, so that the counters in natclasscounter, datachecker, oecalc, CVcounter and rawcounts do not have to re-open and re-split the file every time they need a number.
+
+the corpus is stored as:
+    symbols: a list of segment symbols, in order of first appearance. a segment's ID is its position in this list
+    ids: a dictionary going the other way, {symbol: ID}
+    tokens: a flat numpy array of segment IDs, one word after another
+    offsets: a numpy array of word boundaries. word i is tokens[offsets[i]:offsets[i+1]]
+    tails: whatever followed the first tab on each line (frequency columns, etc.), or None
+    source: the file it was read from, as ('file', full path, modification time, size), or None. the caches in oecalc and tiers use it to recognize a corpus they have seen without reading it again (see source_key)
+
+usage:
+
+>>> import corpusindex as ci
+>>> corpus = ci.load('/home/you/LearningData.txt')
+>>> corpus.unigram_counts(['p', 't', 'k'])
+{'p': 1203, 't': 2210, 'k': 1876}
+
+every function that used to take a path to LearningData.txt will also take one of these.
+
+a corpus can also be compiled once into a directory of arrays, which load() memory-maps instead of parsing the text again:
+
+$ python3 corpusindex.py /home/you/LearningData.txt
+
+writes /home/you/LearningData.corpus/, with
+    tokens.npy: the token array, as uint16 (or uint32 if there are more than 65536 segments)
+    offsets.npy: the word boundaries, as int64
+    symbols.txt: the segment symbols, one per line, in ID order
+    tails.txt: the tab columns, one line per word (only if the file has any)
+
+>>> corpus = ci.load('/home/you/LearningData.corpus')
+
+the arrays are opened read-only, so processes that load the same compiled corpus share its pages.
+'''
+
+import os
+import hashlib
+from array import array
+
+import numpy as np
+
+import ldreader as ldr
+
+
+class CorpusIndex:
+    '''
+    a learning data file interned into integer segment IDs. see module docstring for the attributes.
+    build one with CorpusIndex.from_file(path) or CorpusIndex.from_words(list_of_seglists)
+    '''
+
+    def __init__(self, symbols, tokens, offsets, tails=None, path=None):
+        self.symbols = list(symbols)
+        self.ids = {seg: i for (i, seg) in enumerate(self.symbols)}
+        #arrays that are already integers (including memory-mapped ones) are used as they are, not copied
+        self.tokens = tokens if isinstance(tokens, np.ndarray) and tokens.dtype.kind in 'iu' else np.asarray(tokens, dtype=np.int32)
+        self.offsets = offsets if isinstance(offsets, np.ndarray) and offsets.dtype == np.int64 else np.asarray(offsets, dtype=np.int64)
+        self.tails = tails
+        self.path = path
+        self.source = None
+        self._digest = None
+
+    @classmethod
+    def from_words(cls, words, tails=None, path=None):
+        '''
+        words is an iterable of segment lists, [['p', 'a', 't', 'a'], ['s', 'a', 'mb', 'u'], ...]. it is read once, and can be a generator: segment IDs go straight into compact arrays, so no list of words is built
+        '''
+        ids = {}
+        symbols = []
+        tokens = array('i')
+        offsets = array('q', [0])
+        for word in words:
+            for seg in word:
+                i = ids.get(seg)
+                if i is None:
+                    i = ids[seg] = len(symbols)
+                    symbols.append(seg)
+                tokens.append(i)
+            offsets.append(len(tokens))
+        return cls(symbols, np.frombuffer(tokens, dtype=np.intc), np.frombuffer(offsets, dtype=np.int64), tails=tails, path=path)
+
+    @classmethod
+    def from_file(cls, datapath):
+        '''
+        datapath is a path to LearningData.txt, H&Wilson format: one word per line, segments separated by spaces. it can be compressed, or '-' for stdin (see ldreader)
+        anything after a tab is not treated as part of the word, but is kept in self.tails
+        the file is streamed into the token array one line at a time, and only the tails are collected on the side
+        '''
+        source = source_key(datapath)
+        tails = []
+        def words():
+            for (word, tail) in ldr.records(datapath):
+                tails.append(tail)
+                yield word
+        corpus = cls.from_words(words(), path=datapath)
+        corpus.source = source
+        if any(x is not None for x in tails):
+            corpus.tails = tails
+        return corpus
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def word(self, i):
+        '''
+        returns word i as a list of segment symbols
+        '''
+        return [self.symbols[x] for x in self.tokens[self.offsets[i]:self.offsets[i+1]]]
+
+    def words(self):
+        '''
+        yields every word as a list of segment symbols, in corpus order
+        '''
+        symbols = self.symbols
+        toks = self.tokens.tolist()
+        offs = self.offsets.tolist()
+        for i in range(len(offs)-1):
+            yield [symbols[x] for x in toks[offs[i]:offs[i+1]]]
+
+    def lookup(self, seglist):
+        '''
+        returns an array with one cell per segment ID: the position of that segment in seglist, or -1 if the segment is not in seglist.
+        lookup(conslist)[corpus.tokens] turns the corpus into positions in conslist.
+        '''
+        table = np.full(len(self.symbols), -1, dtype=np.int64)
+        for (pos, seg) in enumerate(seglist):
+            if seg in self.ids:
+                table[self.ids[seg]] = pos
+        return table
+
+    def digest(self):
+        '''
+        a sha1 hex digest of the words (not the tails), the same whether the corpus was read from text or from a compiled directory. tiers uses it to name cached projections
+        '''
+        if self._digest is None:
+            h = hashlib.sha1()
+            h.update('\n'.join(self.symbols).encode('utf-8'))
+            h.update(np.asarray(self.offsets, dtype=np.int64).tobytes())
+            #a chunk at a time, so a big memory-mapped token array is not copied all at once
+            for start in range(0, len(self.tokens), 1 << 20):
+                h.update(np.asarray(self.tokens[start:start+(1 << 20)], dtype=np.int64).tobytes())
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def symbol_counts(self):
+        '''
+        an array of token counts, indexed by segment ID
+        '''
+        return np.bincount(self.tokens, minlength=len(self.symbols))
+
+    def unigram_counts(self, seglist):
+        '''
+        counts up frequencies of each segment in seglist. segments that are not in the data get 0
+        '''
+        counts = self.symbol_counts()
+        return {seg: (int(counts[self.ids[seg]]) if seg in self.ids else 0) for seg in seglist}
+
+    def count(self, seg):
+        '''
+        how often a single segment occurs in the corpus
+        '''
+        if not seg in self.ids:
+            return 0
+        return int(np.count_nonzero(self.tokens == self.ids[seg]))
+
+    def segments(self):
+        '''
+        the segments that actually occur in the data, in order of first appearance
+        '''
+        counts = self.symbol_counts()
+        return [seg for (i, seg) in enumerate(self.symbols) if counts[i] > 0]
+
+    def windows(self, gramsize):
+        '''
+        returns a 2d array of segment IDs, one row per ngram of length gramsize. ngrams do not cross word boundaries.
+        rows are in corpus order.
+        '''
+        lengths = np.diff(self.offsets)
+        nwin = np.maximum(lengths-gramsize+1, 0)
+        #the start of every window: each word's offset, plus 0..nwin-1
+        starts = np.repeat(self.offsets[:-1], nwin) + (np.arange(nwin.sum()) - np.repeat(np.cumsum(nwin)-nwin, nwin))
+        return np.stack([self.tokens[starts+k] for k in range(gramsize)], axis=1) if gramsize else np.empty((len(starts), 0), dtype=np.int32)
+
+    def ngram_counts(self, gramsize):
+        '''
+        counts every ngram of length gramsize that occurs in the data.
+        returns a dictionary with space-separated ngram keys, like count_clusters does: {'n d': 484, 'ɡ b': 924, ...}
+        '''
+        grams = self.windows(gramsize).astype(np.int64)
+        base = max(len(self.symbols), 1)
+        packed = np.zeros(len(grams), dtype=np.int64)
+        for k in range(gramsize):
+            packed = packed*base + grams[:, k]
+        keys, counts = np.unique(packed, return_counts=True)
+        outdic = {}
+        for (key, n) in zip(keys.tolist(), counts.tolist()):
+            segs = []
+            for k in range(gramsize):
+                segs.append(self.symbols[key % base])
+                key //= base
+            outdic[' '.join(reversed(segs))] = n
+        return outdic
+
+
+def load(source):
+    '''
+    source is a path to a LearningData.txt file, a path to a compiled corpus directory, or a CorpusIndex that has already been built.
+    returns a CorpusIndex either way, so functions can take whichever they are handed.
+    '''
+    if isinstance(source, CorpusIndex):
+        return source
+    if is_compiled(source):
+        return load_compiled(source)
+    return CorpusIndex.from_file(source)
+
+
+def source_key(source):
+    '''
+    identifies a corpus for a cache without reading it: a file or compiled corpus by its full path, modification time and size, and a CorpusIndex by the file it was read from (or by the object itself, if it was not read from a file). None for stdin, which is never cached
+    '''
+    if isinstance(source, CorpusIndex):
+        return source.source if source.source is not None else ('corpus', id(source))
+    if source == '-':
+        return None
+    path = os.path.join(source, 'tokens.npy') if is_compiled(source) else source
+    st = os.stat(path)
+    return ('file', os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def compiled_path(datapath):
+    '''
+    where compile_corpus puts the compiled version of datapath by default: LearningData.txt (or LearningData.txt.gz) -> LearningData.corpus, in the same directory
+    '''
+    dirname, basename = os.path.split(datapath)
+    return os.path.join(dirname, basename.split('.')[0]+'.corpus')
+
+
+def is_compiled(path):
+    return isinstance(path, str) and os.path.isfile(os.path.join(path, 'tokens.npy'))
+
+
+def compile_corpus(source, outdir=None):
+    '''
+    source is a path to LearningData.txt (or a CorpusIndex). writes the compiled corpus to outdir (default: compiled_path(source)) and returns outdir
+    '''
+    corpus = load(source)
+    if outdir is None:
+        outdir = compiled_path(corpus.path)
+    os.makedirs(outdir, exist_ok=True)
+    dtype = np.uint16 if len(corpus.symbols) <= 1 << 16 else np.uint32
+    np.save(os.path.join(outdir, 'tokens.npy'), corpus.tokens.astype(dtype))
+    np.save(os.path.join(outdir, 'offsets.npy'), corpus.offsets)
+    with open(os.path.join(outdir, 'symbols.txt'), 'w', encoding='utf-8') as f:
+        for seg in corpus.symbols:
+            f.write(seg+'\n')
+    tailpath = os.path.join(outdir, 'tails.txt')
+    if corpus.tails:
+        #a line with no tail is empty; a line with a tail starts with a tab, so that an empty tail is kept too
+        with open(tailpath, 'w', encoding='utf-8') as f:
+            for tail in corpus.tails:
+                f.write(('' if tail is None else '\t'+tail)+'\n')
+    elif os.path.isfile(tailpath):
+        os.remove(tailpath)
+    return outdir
+
+
+def load_compiled(dirpath, mmap=True):
+    '''
+    loads a corpus written by compile_corpus. with mmap=True (the default), the token and offset arrays are memory-mapped rather than read
+    '''
+    mode = 'r' if mmap else None
+    source = source_key(dirpath)
+    tokens = np.load(os.path.join(dirpath, 'tokens.npy'), mmap_mode=mode)
+    offsets = np.load(os.path.join(dirpath, 'offsets.npy'), mmap_mode=mode)
+    with open(os.path.join(dirpath, 'symbols.txt'), 'r', encoding='utf-8') as f:
+        symbols = [line.rstrip('\n') for line in f]
+    tails = None
+    tailpath = os.path.join(dirpath, 'tails.txt')
+    if os.path.isfile(tailpath):
+        with open(tailpath, 'r', encoding='utf-8') as f:
+            tails = [line.rstrip('\n')[1:] if line.startswith('\t') else None for line in f]
+    corpus = CorpusIndex(symbols, tokens, offsets, tails=tails, path=dirpath)
+    corpus.source = source
+    return corpus
+
+
+def prefer_compiled(datapath):
+    '''
+    returns the compiled version of datapath if there is one at the default location and it is newer than datapath; datapath otherwise
+    '''
+    if not isinstance(datapath, str) or is_compiled(datapath):
+        return datapath
+    cpath = compiled_path(datapath)
+    if is_compiled(cpath) and os.path.getmtime(os.path.join(cpath, 'tokens.npy')) >= os.path.getmtime(datapath):
+        return cpath
+    return datapath
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='compiles LearningData.txt files into memory-mappable arrays, which corpusindex.load (and everything that reads learning data through it) opens without parsing the text.')
+    parser.add_argument('ld', nargs='+', help='paths to LearningData.txt files')
+    parser.add_argument('--out', help='where to write the compiled corpus (only with a single input; default: LearningData.corpus next to the input)')
+    args = parser.parse_args()
+    if args.out and len(args.ld) > 1:
+        parser.error('--out can only be used with a single input file')
+    for path in args.ld:
+        print(compile_corpus(path, args.out))
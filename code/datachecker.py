@@ -11,22 +11,37 @@ usage:
 '''
 import pynatclasses
 import messages as msg
+import corpusindex as ci
+import ngramcounter as ngc
+import ldreader as ldr
 
 def collectLDSegs(somepath):
+	'''
+	somepath is a path to LearningData.txt or a compiled corpus, a corpusindex.CorpusIndex or an ngramcounter.RunningCounts
+	returns the segments in the data, in order of first appearance
+	the empty segment that a double space makes in a word is not a segment that needs features, so it is left out, as are stray spaces around a segment
+	'''
+	if isinstance(somepath, (ci.CorpusIndex, ngc.RunningCounts)):
+		return real_segs(somepath.segments())
+	if ci.is_compiled(somepath):
+		return real_segs(ci.load(somepath).segments())
 	segs = []
+	seen = set()
 	try:
-		with open(somepath, 'r', encoding='utf-8') as ldatafile:
-			for line in ldatafile:
-				wordsegs = line.strip('\n').split()
-				for seg in wordsegs:
-					if not seg in segs:
-						segs.append(seg.strip())
+		for wordsegs in ldr.words(somepath):
+			for seg in real_segs(wordsegs):
+				if not seg in seen:
+					seen.add(seg)
+					segs.append(seg)
 	except FileNotFoundError:
 		msg.env_render(message=f"\n\n\nNo file at {somepath} \n\n\n\n")
 	return segs
 
+def real_segs(segs):
+	return list(dict.fromkeys(x.strip() for x in segs if x.strip()))
+
 def collectFSegs(somepath):
-	return pynatclasses.segs_to_feats(pynatclasses.read_feat_file(somepath)).keys()
+	return pynatclasses.segs_to_feats(somepath).keys()
 
 def findOrphans(learningdata, featurefile, verbose=False):
 	learningdatasegs = collectLDSegs(learningdata)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+reads LearningData.txt files (Hayes and Wilson format: one word per line, segments separated by spaces) one line at a time, so that a counter never holds more than one word of a file in memory.
+
+a learning data file can be:
+    a plain text file
+    a gzip, bz2 or xz file (recognized by its first few bytes, whatever it is called)
+    '-', for standard input (which can also be compressed)
+
+every line is split the same way: anything after the first tab (frequency columns, etc.) is not part of the word, and the word is stripped of leading and trailing whitespace and then split on single spaces, as the learner always has (so two spaces in a row inside a word make an empty segment, but a space at the end of a line does not). this is also how corpusindex reads a file.
+
+usage:
+
+>>> import ldreader as ldr
+>>> for word in ldr.words('/home/you/LearningData.txt.gz'):
+...     print(word)
+['p', 'a', 't', 'a']
+...
+
+$ xzcat LearningData.txt.xz | python3 rawcounts.py - 'a'
+
+files whose names end in .gz, .bz2 or .xz are also written compressed by open_ld(path, 'w').
+'''
+
+import io
+import os
+import sys
+import gzip
+import bz2
+import lzma
+
+#bytes read from disk (or decompressed) at a time
+BUFSIZE = 1 << 20
+
+MAGIC = [(b'\x1f\x8b', gzip.open), (b'BZh', bz2.open), (b'\xfd7zXZ\x00', lzma.open)]
+EXTENSIONS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def open_ld(path, mode='r'):
+    '''
+    opens a learning data file as utf-8 text, for reading ('r') or writing ('w').
+    when reading, compression is detected from the start of the file; when writing, from the extension of path. '-' is stdin
+    '''
+    if mode == 'w':
+        opener = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if opener is None:
+            return open(path, 'w', encoding='utf-8', buffering=BUFSIZE)
+        return io.TextIOWrapper(io.BufferedWriter(opener(path, 'wb'), buffer_size=BUFSIZE), encoding='utf-8')
+    if path == '-':
+        raw = sys.stdin.buffer
+        opener = sniff(raw.peek(6))
+        if opener is not None:
+            raw = io.BufferedReader(opener(raw, 'rb'), buffer_size=BUFSIZE)
+        return io.TextIOWrapper(raw, encoding='utf-8')
+    with open(path, 'rb') as f:
+        opener = sniff(f.read(6))
+    if opener is None:
+        return open(path, 'r', encoding='utf-8', buffering=BUFSIZE)
+    return io.TextIOWrapper(io.BufferedReader(opener(path, 'rb'), buffer_size=BUFSIZE), encoding='utf-8')
+
+
+def sniff(start):
+    '''
+    returns the function that opens a file starting with these bytes (gzip.open, bz2.open or lzma.open), or None for an uncompressed file
+    '''
+    for (magic, opener) in MAGIC:
+        if start.startswith(magic):
+            return opener
+    return None
+
+
+def exists(path):
+    '''
+    True if there is something to read at path
+    '''
+    return path == '-' or os.path.isfile(path)
+
+
+def split_line(line):
+    '''
+    splits one line of learning data into (segments, tail). tail is whatever followed the first tab, or None. the word is stripped, and its segments are separated by single spaces
+    '''
+    line = line.rstrip('\n')
+    if '\t' in line:
+        word, tail = line.split('\t', 1)
+        return (word.strip().split(' '), tail)
+    return (line.strip().split(' '), None)
+
+
+def records(path):
+    '''
+    yields (segments, tail) for every line of the file, in order
+    '''
+    with open_ld(path) as f:
+        for line in f:
+            yield split_line(line)
+
+
+def words(path):
+    '''
+    yields every word in the file as a list of segments, in order
+    '''
+    for (word, tail) in records(path):
+        yield word
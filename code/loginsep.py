@@ -12,7 +12,6 @@ $ python3 loginsep.py --help
 #standard modules
 import os 
 import sys 
-from re import sub as resub
 import shutil
 import numpy as np
 
@@ -21,6 +20,7 @@ import numpy as np
 import natclasscounter as nc
 import pynatclasses as pnc
 import datachecker as dc
+import rewriter as rw
 import plot_insep as pins
 import messages as msg
 
@@ -260,6 +260,7 @@ def write_new_feats(outpath, featlist):
         f.write("\t" + "\t".join(featlist[0])+'\n')
         for line in featlist[1]:
             f.write('\t'.join(line) + '\n')
+    pnc.invalidate(outpath)
 
 
 def write_new_ld_file(clusters, oldpath, newpath, threshold=1, **kwargs):
@@ -269,23 +270,10 @@ def write_new_ld_file(clusters, oldpath, newpath, threshold=1, **kwargs):
     threshold defaults to 1 (inseparability measure)
     bigram clusters are sorted by their inseparability value;
     thus, if something that eventually becomes a trigram or tetragram has two-way parts in the current inseparability table, the bigram that is higher on the list will be replaced first.
+    all the clusters are merged in one pass over each line (see rewriter); tab columns are kept
     '''
     clustlist = sorted([x for x in clusters if clusters[x]>=threshold], key=clusters.get, reverse=True)
-    with open(oldpath, 'r', encoding='utf-8') as f:
-        with open(newpath, 'w', encoding='utf-8') as out:
-            for line in f:
-                word = line.strip()
-                if '\t' in line:
-                    word = line.split('\t')[0]
-                    rest = line.split('\t')[1:]
-                for clust in clustlist: 
-                    x = r'(^|\s)'+(clust)+r'(\s|$)'
-                    y = r'\1'+''.join(clust.split(" "))+r'\2'
-                    word = resub(x, y, word)
-                if '\t' in line:
-                    out.write(f"word\trest")
-                else:
-                    out.write(word +'\n')
+    rw.ClusterRewriter(clustlist).rewrite_file(oldpath, newpath)
     msg.env_render(message=f"\n\nWrote modified learning data to {newpath.split('simulation')[1]}", **kwargs)
                             
 
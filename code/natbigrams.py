@@ -5,14 +5,18 @@
 import os
 import sys
 import itertools
+import heapq
 from datetime import datetime
 
 #special/external
-import scipy
-from nltk import ngrams
+import numpy as np
+from scipy import sparse
 
 import pynatclasses as pnc
 import messages as msg
+import corpusindex as ci
+import ngramcounter as ngc
+import significance as sig
 
 '''
 During the review process, the question arose why bigram probabilities were calculated over segments rather than over natural class sequences. This module explores the natural class bigram option.
@@ -23,23 +27,44 @@ During the review process, the question arose why bigram probabilities were calc
     # from inseparability.txt, calculate unigram probs for each nat class in NC1 NC2 positions.
     # then calculate bigrams same way
 
+def membership_matrix(segs, classes, natclassdic):
+    '''
+    a sparse len(segs) x len(classes) matrix, with a 1 in cell [i, k] if segs[i] is in natural class classes[k]
+    '''
+    index = {seg: i for (i, seg) in enumerate(segs)}
+    rows = []
+    cols = []
+    for (k, cl) in enumerate(classes):
+        for seg in set(natclassdic[cl]):
+            if seg in index:
+                rows.append(index[seg])
+                cols.append(k)
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(len(segs), len(classes)))
+
+
 def get_unigram_counts_per_class(**kwargs):
     '''
     requires a wordlist, a list of consonants, and a natural class dictionary (e.g., {"-syll,-cont": ['p', 't', 'k']...})
-    returns a dictionary with segment counts for each natural class
+    the wordlist can also be a corpusindex.CorpusIndex or a path to a compiled corpus, in which case the words are not visited one by one
+    returns a dictionary with segment counts for each natural class: M.T @ u, where u is the vector of consonant counts and M is membership_matrix
     '''
     wdlist = kwargs['data']
     cons = kwargs['conslist'] #pnc.get_consonants(featfilepath)
     natclassdic = kwargs['natclassdic'] # pnc.wrap_classes(featfilepath)
-    outdic={}
-    for cl in natclassdic:
-        if set(natclassdic[cl]).issubset(set(cons)):
-            outdic[cl]=0        
-    for wd in wdlist:
-        wd = wd.strip('\n').split(' ')
-        for cl in outdic:
-            outdic[cl] += len([x for x in wd if x in natclassdic[cl]])
-    return outdic
+    consset = set(cons)
+    classes = [cl for cl in natclassdic if set(natclassdic[cl]).issubset(consset)]
+    segs = list(dict.fromkeys(cons))
+    if isinstance(wdlist, ci.CorpusIndex) or ci.is_compiled(wdlist):
+        counts = ci.load(wdlist).unigram_counts(segs)
+    else:
+        counts = {}.fromkeys(segs, 0)
+        for wd in wdlist:
+            for x in wd.strip('\n').split(' '):
+                if x in counts:
+                    counts[x] += 1
+    unigrams = np.array([counts[x] for x in segs], dtype=np.int64)
+    classcounts = membership_matrix(segs, classes, natclassdic).T @ unigrams
+    return dict(zip(classes, classcounts.tolist()))
 
 
 def make_natclass_bigrams(**kwargs):
@@ -51,50 +76,79 @@ def make_natclass_bigrams(**kwargs):
     print('\n\n\nNumber of consonantal natural class bigrams\t' + str(len(outlist)) +'\n\n\n')
     return outlist
 
+
+def read_bigram_matrix(inseppath, segs):
+    '''
+    the segment bigram counts in inseparability.txt (the N(C1C2) column), as a sparse len(segs) x len(segs) matrix. clusters with a segment that is not in segs are left out
+    '''
+    index = {seg: i for (i, seg) in enumerate(segs)}
+    rows = []
+    cols = []
+    counts = []
+    with open(inseppath, 'r', encoding='utf-8') as f:
+        next(f, None)
+        for line in f:
+            line = line.strip('\n').split('\t')
+            ngram = line[0].split(' ')
+            if ngram[0] in index and ngram[1] in index:
+                rows.append(index[ngram[0]])
+                cols.append(index[ngram[1]])
+                counts.append(int(line[2]))
+    #duplicate cells are added up
+    return sparse.csr_matrix((np.array(counts, dtype=np.int64), (rows, cols)), shape=(len(segs), len(segs)))
+
+
 def count_natclass_bigrams(**kwargs):
     '''
-    gets a nat class bigram list and a bigram count (from inseparability.txt)
-    returns counts for each nat class bigram by looking up its seg sequences in the list
+    gets a nat class bigram list and a bigram count (from inseparability.txt, or data= a LearningData.txt path or corpusindex.CorpusIndex)
+    returns counts for each nat class bigram, as M.T @ B @ M: B is the segment bigram count matrix and M is the segment x class membership_matrix, so every class bigram is counted at once
+    only the bigrams that occur are returned, in the order of the bigram list
     '''
     natclassdic = kwargs['natclassdic']
-    bigrams = {}.fromkeys(kwargs['bigrams'], 0) #make_natclass_bigrams() output
-    with open(kwargs['inseppath'], 'r', encoding='utf-8') as f:
-        lines = f.readlines()[1:]
-    for line in lines:
-        line = line.strip('\n').split('\t')
-        seg1 = line[0].split(' ')[0]
-        seg2 = line[0].split(' ')[1]
-        for bigram in bigrams:
-            cl1 = bigram.split(" ")[0]
-            cl2 = bigram.split(" ")[1]
-            if seg1 in natclassdic[cl1] and seg2 in natclassdic[cl2]:
-                bigrams[bigram]+=int(line[2])
-    return {k: v for k, v in bigrams.items() if v is not 0}
-             
-    
+    bigrams = kwargs['bigrams'] #make_natclass_bigrams() output
+    classes = list(dict.fromkeys(cl for x in bigrams for cl in x.split(' ')))
+    segs = list(dict.fromkeys(seg for cl in classes for seg in natclassdic[cl]))
+    if 'data' in kwargs:
+        segcounts = sparse.csr_matrix(ngc.count_matrix(segs, kwargs['data']).matrix.astype(np.int64))
+    else:
+        segcounts = read_bigram_matrix(kwargs['inseppath'], segs)
+    memb = membership_matrix(segs, classes, natclassdic)
+    classcounts = (memb.T @ segcounts @ memb).toarray()
+    index = {cl: k for (k, cl) in enumerate(classes)}
+    outdic = {}
+    for bigram in bigrams:
+        cl1, cl2 = bigram.split(' ')
+        n = int(classcounts[index[cl1], index[cl2]])
+        if n != 0:
+            outdic[bigram] = n
+    return outdic
+
+
+def transprobs(clustercount, unigramcount):
+    '''
+    forward and backward transitional probabilities for every non-zero class bigram at once, with the totals taken once.
+    returns (names, n, forward, backward); the first three are in clustercount order
+    '''
+    names = [x for x in clustercount if not clustercount[x]==0]
+    n = np.array([clustercount[x] for x in names], dtype=np.int64)
+    total = float(sum(clustercount.values()))
+    unitotal = float(sum(unigramcount.values()))
+    if total == 0 or unitotal == 0:
+        zeros = np.zeros(len(names))
+        return (names, n, zeros, zeros)
+    firsts = np.array([unigramcount[x.split(' ')[0]] for x in names], dtype=float)
+    lasts = np.array([unigramcount[x.split(' ')[1]] for x in names], dtype=float)
+    prob_ngram = n/total
+    return (names, n, prob_ngram/(firsts/unitotal), prob_ngram/(lasts/unitotal))
+
+
 def forward_tp(clustercount, unigramcount):
-    tpd = {}
-    for ngram in [x for x in clustercount if not clustercount[x]==0]:
-        cons = ngram.split(" ")[0]
-        if sum(clustercount.values())==0 or sum(unigramcount.values())==0:
-            tpd[ngram] = 0
-        else:
-            prob_ngram = clustercount[ngram]/float(sum(clustercount.values()))
-            prob_cons = unigramcount[cons]/float(sum(unigramcount.values()))
-            tpd[ngram] = prob_ngram/prob_cons
-    return tpd
+    names, n, forward, backward = transprobs(clustercount, unigramcount)
+    return dict(zip(names, forward.tolist()))
 
 def backward_tp(clustercount, unigramcount):
-    tpd = {}
-    for ngram in [x for x in clustercount if not clustercount[x]==0]:
-        cons = ngram.split(" ")[1]
-        if sum(clustercount.values())==0 or sum(unigramcount.values())==0:
-            tpd[ngram]=0
-        else:
-            prob_ngram = clustercount[ngram]/float(sum(clustercount.values()))
-            prob_cons = unigramcount[cons]/float(sum(unigramcount.values()))
-            tpd[ngram] = prob_ngram/prob_cons
-    return tpd
+    names, n, forward, backward = transprobs(clustercount, unigramcount)
+    return dict(zip(names, backward.tolist()))
 
 # stats calculation
 
@@ -102,29 +156,23 @@ def findPValue(ngram,clustercount,allclustercounts):
     '''
     this does a fisher's exact tests with the goal of determining whether or not the observed number of a particular cluster is significantly different than 0.  it takes two arguments: the number of a particular kind of cluster (produced by count_clusters()) and the unigramcount (produced by uni_counts)).
     '''
-    pValue = scipy.stats.fisher_exact([[clustercount,allclustercounts-clustercount],[0,allclustercounts]])
-    return pValue[1]
+    return float(sig.fisher_pvalues([clustercount], allclustercounts)[0])
 
 
 def insep(clustercount, unigramcount):
     '''
     returns a dictionary of bidirectional inseparability measures: given a dictionary of ngrams xy, calculates prob of x being followed by y of all things (forward prob), and of y being preceded by x of all things (backward prob). needs a dictionary of clusters/ngram counts in a wordlist, and a dictionary of unigram counts. (produced by count_clusters() and uni_counts() respectively)
+    all the probabilities and p-values are computed together, as arrays
     '''
-    forwards = forward_tp(clustercount, unigramcount)
-    print('calculated forward tp')
-    backwards = backward_tp(clustercount, unigramcount)
-    print('calculated backward tp')
-    tpd = {}
+    names, n, forwards, backwards = transprobs(clustercount, unigramcount)
+    print('calculated forward and backward tp')
+    insepvals = (forwards*backwards).tolist()
+    pvals = sig.fisher_pvalues(n, sum(clustercount.values())).tolist()
+    tpd = dict(zip(names, insepvals))
     countd = {}
-    pvals = {} 
-    for ngram in [x for x in clustercount if not clustercount[x]==0]:
-        if ngram in forwards and ngram in backwards:
-            tpd[ngram] = forwards[ngram]*backwards[ngram]
-            pvals[ngram] = findPValue(ngram,clustercount[ngram],sum(clustercount.values()))
-            outstring = [ngram, round(tpd[ngram], 4), clustercount[ngram], unigramcount[ngram.split(' ')[0]], unigramcount[ngram.split(' ')[1]], round(pvals[ngram], 3)] 
-            countd[ngram] = '\t'.join(str(x) for x in outstring) 
-        else:
-            tpd[ngram]=0
+    for (i, ngram) in enumerate(names):
+        outstring = [ngram, round(insepvals[i], 4), clustercount[ngram], unigramcount[ngram.split(' ')[0]], unigramcount[ngram.split(' ')[1]], round(pvals[i], 3)] 
+        countd[ngram] = '\t'.join(str(x) for x in outstring) 
     return (tpd, countd)
 
 
@@ -138,6 +186,66 @@ def bidir_prob_wrapper(**kwargs):
     return bidic
 
 
+def distinct_classes(classes, natclassdic):
+    '''
+    keeps the first class name for each extension: classes with the same segments would only repeat each other's bigrams
+    '''
+    seen = set()
+    outlist = []
+    for cl in classes:
+        ext = frozenset(natclassdic[cl])
+        if not ext in seen:
+            seen.add(ext)
+            outlist.append(cl)
+    return outlist
+
+
+def natclass_insep(featpath, datapath, topk=None, **kwargs):
+    '''
+    natural class bigram inseparability straight from the learning data, without a compseg run (and its inseparability.txt) first.
+    featpath leads to Features.txt, or is a feature table (see pynatclasses.load_feats); datapath is a path to LearningData.txt, a compiled corpus or a corpusindex.CorpusIndex, and is read once.
+    consonantal classes with the same extension are counted once, under the first name. class bigrams that do not occur in the data are dropped before anything is scored, and if topk is given, only the topk most inseparable bigrams are kept (through a heap) and get p-values.
+    returns (tpd, countd) like insep, for the bigrams that are kept, most inseparable first
+    '''
+    conslist = pnc.get_consonants(featpath, **kwargs)
+    natclassdic = pnc.wrap_classes(featpath)
+    consset = set(conslist)
+    classes = distinct_classes([cl for cl in natclassdic if set(natclassdic[cl]).issubset(consset)], natclassdic)
+    segs = list(dict.fromkeys(conslist))
+    counts = ngc.count_matrix(segs, ci.load(datapath))
+    memb = membership_matrix(segs, classes, natclassdic)
+    unigrams = memb.T @ counts.unigrams
+    classcounts = (memb.T @ sparse.csr_matrix(counts.matrix.astype(np.int64)) @ memb).tocoo()
+    #only the class bigrams that occur, in the order make_natclass_bigrams would list them
+    order = np.lexsort((classcounts.col, classcounts.row))
+    rows = classcounts.row[order]
+    cols = classcounts.col[order]
+    n = classcounts.data[order]
+    keep = n != 0
+    rows, cols, n = rows[keep], cols[keep], n[keep]
+    total = float(n.sum())
+    unitotal = float(unigrams.sum())
+    if total == 0 or unitotal == 0:
+        insepvals = np.zeros(len(n))
+    else:
+        prob_ngram = n/total
+        insepvals = (prob_ngram/(unigrams[rows]/unitotal))*(prob_ngram/(unigrams[cols]/unitotal))
+    insepvals = insepvals.tolist()
+    if topk is None:
+        best = sorted(range(len(n)), key=insepvals.__getitem__, reverse=True)
+    else:
+        best = heapq.nlargest(topk, range(len(n)), key=insepvals.__getitem__)
+    pvals = sig.fisher_pvalues(n[best], int(total)).tolist()
+    tpd = {}
+    countd = {}
+    for (i, pval) in zip(best, pvals):
+        ngram = classes[rows[i]]+' '+classes[cols[i]]
+        tpd[ngram] = insepvals[i]
+        outstring = [ngram, round(insepvals[i], 4), int(n[i]), int(unigrams[rows[i]]), int(unigrams[cols[i]]), round(pval, 3)]
+        countd[ngram] = '\t'.join(str(x) for x in outstring)
+    return (tpd, countd)
+
+
 def write_insep(**kwargs):
     d= kwargs['bidir']
     outpath = kwargs['outpath']
@@ -152,35 +260,20 @@ def write_insep(**kwargs):
 
 
 if __name__ == '__main__':
-    import sys, os
+    import argparse
+    parser = argparse.ArgumentParser(description='natural class bigram inseparability, counted straight from the learning data.')
+    parser.add_argument('--ld', help="full path to learning data file")
+    parser.add_argument('--feats', help="full path to feature file")
+    parser.add_argument('--language', help='a folder inside "data", as in compseg.py', default='ngbaka')
+    parser.add_argument('--topk', help='keep only this many class bigrams, the most inseparable ones', type=int)
+    parser.add_argument('--out', help='where to write the table (default: natclass_bigram_insep.txt next to the learning data)')
+    args = parser.parse_args()
     stime = datetime.now()
-    basepath = os.path.dirname(os.getcwd())
-    #datapath = 'data/turkish/tell'
-    #datapath = 'data/quechua/roots'
-    #datapath = 'data/hebrew'
-    #datapath = 'data/russian/zaliznjak'
-    #datapath = 'data/english/celex/broad'
-    #datapath = 'data/latin/long'
-    #datapath = 'data/greek'
-    #datapath = 'data/fijian'
-    #datapath = 'data/navajo/stems'
-    datapath = 'data/ngbaka'
-    #datapath = 'data/english/celex/narrow'
-    #datapath = 'data/french/childes_cds'
-    #datapath = 'data/polish/polex/narrow'
-    print(datapath)
-    outpath = os.path.join(basepath, datapath, 'natclass_bigram_insep.txt')
-    featfilepath = os.path.join(basepath, datapath, 'Features.txt')
-    wordlist = os.path.join(basepath, datapath, 'LearningData.txt')
-    inseppath = os.path.join(basepath, datapath, 'simulation/iteration1/inseparability.txt')
-    conslist = pnc.get_consonants(featfilepath)
-    natclassdic = pnc.wrap_classes(featfilepath)
-    with open(wordlist, 'r', encoding='utf-8') as f:
-        unigramcounts = get_unigram_counts_per_class(data=f, conslist=conslist, natclassdic=natclassdic) 
-    bigrams = make_natclass_bigrams(consdic=unigramcounts)
-    print('doing bigram counts now')
-    bigramcounts = count_natclass_bigrams(natclassdic = natclassdic, bigrams = bigrams, inseppath = inseppath)
-    x = bidir_prob_wrapper(bigramcounts=bigramcounts, unigramcounts=unigramcounts)
-    write_insep(bidir=x, outpath=outpath, natclassdic=natclassdic)
+    if not args.ld:
+        lgpath = os.path.join(os.path.dirname(os.getcwd()), 'data', args.language)
+        args.ld = ci.prefer_compiled(os.path.join(lgpath, 'LearningData.txt'))
+        args.feats = os.path.join(lgpath, 'Features.txt')
+    outpath = args.out or os.path.join(os.path.dirname(os.path.normpath(args.ld)), 'natclass_bigram_insep.txt')
+    x = natclass_insep(args.feats, args.ld, topk=args.topk)
+    write_insep(bidir=x, outpath=outpath, natclassdic=pnc.wrap_classes(args.feats))
     print(datetime.now()-stime)
-
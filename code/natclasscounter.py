@@ -5,13 +5,18 @@
 import os
 import sys
 import itertools
+from collections.abc import Mapping
 
 #special/external
-import scipy
+import numpy as np
 from nltk import ngrams
 
 import pynatclasses as pnc
 import messages as msg
+import corpusindex as ci
+import ngramcounter as ngc
+import ldreader as ldr
+import significance as sig
 
 '''
 the module extracts sequences of consonants from a corpus, and calculates the inseparability measures of certain clusters from probabilities of individual Cs and CCs in a phonological corpus. 
@@ -29,76 +34,145 @@ def list_clusters(conslist, gramsize):
 def count_clusters(clustlist, datapath, gramsize):
     '''
     walks through each word in learning data and counts up its ngrams
-    datapath is path to LearningData.txt, H&Wilson format
+    datapath is path to LearningData.txt, H&Wilson format (read through ldreader, so it can be compressed), or a corpusindex.CorpusIndex built from one
     clustlist is dictionary returned by list_clusters above
     gramsize is the length of ngrams (usu. betw 2 and 3)
     '''
     clustercount = {}.fromkeys(clustlist, 0)
-    with open(datapath, 'r', encoding='utf-8') as f:
-        for line in f:
-            if '\t' in line:
-                line = line.split('\t')[0]
-            grams = line.strip().split(" ")
-            word = [' '.join(x) for x in ngrams(grams, gramsize)]
-            for cluster in clustercount:
-                clustercount[cluster]+=len([x for x in word if x==cluster])
+    if isinstance(datapath, ci.CorpusIndex):
+        for (cluster, n) in datapath.ngram_counts(gramsize).items():
+            if cluster in clustercount:
+                clustercount[cluster] = n
+        return clustercount
+    for grams in ldr.words(datapath):
+        word = [' '.join(x) for x in ngrams(grams, gramsize)]
+        for cluster in clustercount:
+            clustercount[cluster]+=len([x for x in word if x==cluster])
     return clustercount
 
 
 def uni_counts(conslist, datapath):
     '''
     counts up frequencies of each consonant in data
+    datapath can be a path or a corpusindex.CorpusIndex
     '''
+    if isinstance(datapath, ci.CorpusIndex):
+        return datapath.unigram_counts(conslist)
     unigramcount={}.fromkeys(conslist, 0)
-    with open(datapath, 'r', encoding='utf-8') as f:
-        for word in f:
-            word = word.strip().split(" ")
-            for c in unigramcount:
-                unigramcount[c] += len([x for x in word if x == c])
+    for word in ldr.words(datapath):
+        for c in unigramcount:
+            unigramcount[c] += len([x for x in word if x == c])
     return unigramcount
 
 def first_counts(conslist, clustercount):
     '''
     counts up how often each consonant occurs as C1 in a bigram
+    clustercount can be a dictionary or an ngramcounter.ClusterCounts, whose row sums are the answer (or an ngramcounter.NgramCounts, for C1 of an ngram)
     '''
+    if isinstance(clustercount, ngc.ClusterCounts):
+        rowsums = clustercount.matrix.sum(axis=1).tolist()
+        return {c: (rowsums[clustercount.index[c]] if c in clustercount.index else 0) for c in conslist}
+    if isinstance(clustercount, ngc.NgramCounts):
+        firsts = clustercount.position_counts(0).tolist()
+        return {c: (firsts[clustercount.index[c]] if c in clustercount.index else 0) for c in conslist}
     count={}.fromkeys(conslist, 0)
-    for c in count:
-        the_counts = [clustercount[ngram] for ngram in clustercount if ngram.split(" ")[0] == c]
-        count[c] += sum(the_counts)
+    for ngram in clustercount:
+        c = ngram.split(" ")[0]
+        if c in count:
+            count[c] += clustercount[ngram]
     return count
 
 def last_counts(conslist, clustercount):
     '''
     counts up how often each consonant occurs as C2 in a bigram
+    clustercount can be a dictionary or an ngramcounter.ClusterCounts, whose column sums are the answer (or an ngramcounter.NgramCounts, for the last C of an ngram)
     '''
+    if isinstance(clustercount, ngc.ClusterCounts):
+        colsums = clustercount.matrix.sum(axis=0).tolist()
+        return {c: (colsums[clustercount.index[c]] if c in clustercount.index else 0) for c in conslist}
+    if isinstance(clustercount, ngc.NgramCounts):
+        lasts = clustercount.position_counts(-1).tolist()
+        return {c: (lasts[clustercount.index[c]] if c in clustercount.index else 0) for c in conslist}
     count={}.fromkeys(conslist, 0)
-    for c in count:
-        the_counts = [clustercount[ngram] for ngram in clustercount if ngram.split(" ")[1] == c]
-        count[c] += sum(the_counts)
+    for ngram in clustercount:
+        c = ngram.split(" ")[1]
+        if c in count:
+            count[c] += clustercount[ngram]
     return count
 
 
+def transprobs(counts):
+    '''
+    the matrix engine behind insep: given an ngramcounter.ClusterCounts or NgramCounts, computes forward and backward transitional probabilities for every non-zero cluster at once.
+    for ngrams longer than 2, forward is the prob of the first consonant being followed by the rest, and backward the prob of the last one being preceded by the rest.
+    totals are taken once, not once per cluster.
+    returns (firsts, lasts, n, forward, backward), arrays with one entry per observed ngram: positions of its first and last consonant in counts.segs, its count, and the two probabilities.
+    the order is the one the dictionary functions visit clusters in (row-major, for a matrix)
+    '''
+    if isinstance(counts, ngc.ClusterCounts):
+        counts = counts.to_ngrams()
+    firsts = counts.grams[:, 0]
+    lasts = counts.grams[:, -1]
+    n = counts.counts
+    total = float(counts.total())
+    unitotal = float(counts.unigrams.sum())
+    if total == 0 or unitotal == 0:
+        zeros = np.zeros(len(n))
+        return (firsts, lasts, n, zeros, zeros)
+    prob_ngram = n/total
+    forward = prob_ngram/(counts.unigrams[firsts]/unitotal)
+    backward = prob_ngram/(counts.unigrams[lasts]/unitotal)
+    return (firsts, lasts, n, forward, backward)
+
+
+def ngram_names(counts):
+    '''
+    the observed ngrams of an ngramcounter.ClusterCounts or NgramCounts, as strings, in the order transprobs returns them
+    '''
+    if isinstance(counts, ngc.ClusterCounts):
+        counts = counts.to_ngrams()
+    return counts.names()
+
+
 def forward_tp(clustercount, unigramcount):
+    '''
+    prob of the first consonant being followed by the second, for every non-zero cluster
+    clustercount can also be an ngramcounter.ClusterCounts or NgramCounts (unigramcount is then ignored)
+    '''
+    if isinstance(clustercount, (ngc.ClusterCounts, ngc.NgramCounts)):
+        firsts, lasts, n, forward, backward = transprobs(clustercount)
+        return dict(zip(ngram_names(clustercount), forward.tolist()))
     tpd = {}
+    total = float(sum(clustercount.values()))
+    unitotal = float(sum(unigramcount.values()))
     for ngram in [x for x in clustercount if not clustercount[x]==0]:
         cons = ngram.split(" ")[0]
-        if sum(clustercount.values())==0 or sum(unigramcount.values())==0:
+        if total==0 or unitotal==0:
             tpd[ngram] = 0
         else:
-            prob_ngram = clustercount[ngram]/float(sum(clustercount.values()))
-            prob_cons = unigramcount[cons]/float(sum(unigramcount.values()))
+            prob_ngram = clustercount[ngram]/total
+            prob_cons = unigramcount[cons]/unitotal
             tpd[ngram] = prob_ngram/prob_cons
     return tpd
 
 def backward_tp(clustercount, unigramcount):
+    '''
+    prob of the second consonant being preceded by the first, for every non-zero cluster
+    clustercount can also be an ngramcounter.ClusterCounts or NgramCounts (unigramcount is then ignored)
+    '''
+    if isinstance(clustercount, (ngc.ClusterCounts, ngc.NgramCounts)):
+        firsts, lasts, n, forward, backward = transprobs(clustercount)
+        return dict(zip(ngram_names(clustercount), backward.tolist()))
     tpd = {}
+    total = float(sum(clustercount.values()))
+    unitotal = float(sum(unigramcount.values()))
     for ngram in [x for x in clustercount if not clustercount[x]==0]:
         cons = ngram.split(" ")[1]
-        if sum(clustercount.values())==0 or sum(unigramcount.values())==0:
+        if total==0 or unitotal==0:
             tpd[ngram]=0
         else:
-            prob_ngram = clustercount[ngram]/float(sum(clustercount.values()))
-            prob_cons = unigramcount[cons]/float(sum(unigramcount.values()))
+            prob_ngram = clustercount[ngram]/total
+            prob_cons = unigramcount[cons]/unitotal
             tpd[ngram] = prob_ngram/prob_cons
     return tpd
 
@@ -107,24 +181,27 @@ def backward_tp(clustercount, unigramcount):
 def findPValue(ngram,clustercount,allclustercounts):
     '''
     this does a fisher's exact tests with the goal of determining whether or not the observed number of a particular cluster is significantly different than 0.  it takes two arguments: the number of a particular kind of cluster (produced by count_clusters()) and the unigramcount (produced by uni_counts)).
+    the test is done by the significance module, which remembers p-values it has already computed. to get p-values for many clusters at once, use significance.fisher_pvalues
     '''
-    pValue = scipy.stats.fisher_exact([[clustercount,allclustercounts-clustercount],[0,allclustercounts]])
-    return pValue[1]
+    return float(sig.fisher_pvalues([clustercount], allclustercounts)[0])
 
 
-def insep(clustercount, unigramcount):
+def insep(clustercount, unigramcount, threshold=None, pvalues='all'):
     '''
     returns a dictionary of bidirectional inseparability measures: given a dictionary of ngrams xy, calculates prob of x being followed by y of all things (forward prob), and of y being preceded by x of all things (backward prob). needs a dictionary of clusters/ngram counts in a wordlist, and a dictionary of unigram counts. (produced by count_clusters() and uni_counts() respectively)
+    clustercount can also be an ngramcounter.ClusterCounts matrix or an ngramcounter.NgramCounts (for ngrams of any length), in which case only the observed ngrams are visited, and p-values can be put off (see insep_matrix for threshold and pvalues)
     '''
+    if isinstance(clustercount, (ngc.ClusterCounts, ngc.NgramCounts)):
+        return insep_matrix(clustercount, threshold, pvalues)
     forwards = forward_tp(clustercount, unigramcount)
     backwards = backward_tp(clustercount, unigramcount)
     tpd = {}
     countd = {}
-    pvals = {} 
-    for ngram in [x for x in clustercount if not clustercount[x]==0]:
+    observed = [x for x in clustercount if not clustercount[x]==0]
+    pvals = dict(zip(observed, sig.fisher_pvalues([clustercount[x] for x in observed], sum(clustercount.values())).tolist()))
+    for ngram in observed:
         if ngram in forwards and ngram in backwards:
             tpd[ngram] = forwards[ngram]*backwards[ngram]
-            pvals[ngram] = findPValue(ngram,clustercount[ngram],sum(clustercount.values()))
             outstring = [ngram, round(tpd[ngram], 2), clustercount[ngram], unigramcount[ngram.split(' ')[0]], unigramcount[ngram.split(' ')[1]], round(pvals[ngram], 3)] 
             countd[ngram] = '\t'.join(str(x) for x in outstring) 
         else:
@@ -132,10 +209,84 @@ def insep(clustercount, unigramcount):
     return (tpd, countd)
 
 
+def insep_matrix(counts, threshold=None, pvalues='all'):
+    '''
+    the same as insep, but for an ngramcounter.ClusterCounts or NgramCounts object: all the probabilities come from one call to transprobs.
+    for longer ngrams, N(C1) and N(C2) in the rows are the counts of the first and last consonant.
+    clusters are visited in the same order as the dictionary version visits them, so ties sort the same way in write_insep.
+    pvalues decides when Fisher's exact test is done for each cluster:
+        'all': for every cluster, right away
+        'lazy': right away for clusters whose inseparability is at or above threshold (the only ones complexify looks at), and for the rest in one batch the first time one of their rows is needed (e.g., by write_insep)
+        'none': for clusters at or above threshold only; the other rows get NA in the p column
+    without a threshold, 'lazy' and 'none' work like 'all'.
+    returns (tpd, countd), where countd is an InsepRows mapping that can be used like the dictionary of tab-separated rows insep returns.
+    '''
+    total = counts.total()
+    firsts, lasts, n, forward, backward = transprobs(counts)
+    insepvals = forward*backward
+    ngrams = ngram_names(counts)
+    tpd = dict(zip(ngrams, insepvals.tolist()))
+    countd = InsepRows(ngrams, insepvals, n, counts.unigrams[firsts], counts.unigrams[lasts], total, pvalues)
+    if threshold is None or pvalues == 'all':
+        countd.fill_pvalues()
+    else:
+        countd.fill_pvalues(np.nonzero(insepvals >= threshold)[0])
+    return (tpd, countd)
+
+
+class InsepRows(Mapping):
+    '''
+    the rows of an inseparability table, {ngram: 'ngram\tinsep\tN(C1C2)\tN(C1)\tN(C2)\tp(C1C2)'}, made when they are asked for.
+    the p-values that have not been computed yet are computed together, the first time any row that needs one is asked for; if pvalues is 'none', they are not computed at all and the row says NA.
+    '''
+
+    def __init__(self, ngrams, insepvals, n, firsts, lasts, total, pvalues='all'):
+        self.ngrams = ngrams
+        self.index = {ngram: i for (i, ngram) in enumerate(ngrams)}
+        self.insepvals = insepvals.tolist()
+        self.n = n.tolist()
+        self.firsts = firsts.tolist()
+        self.lasts = lasts.tolist()
+        self.total = total
+        self.pvalues = pvalues
+        self.pvals = [None]*len(ngrams)
+
+    def fill_pvalues(self, which=None):
+        '''
+        computes the p-values for the rows numbered in which (all the rows that do not have one yet, by default)
+        '''
+        if which is None:
+            which = [i for (i, p) in enumerate(self.pvals) if p is None]
+        which = list(which)
+        if which:
+            for (i, p) in zip(which, sig.fisher_pvalues([self.n[i] for i in which], self.total).tolist()):
+                self.pvals[i] = p
+
+    def __getitem__(self, ngram):
+        i = self.index[ngram]
+        if self.pvals[i] is None and not self.pvalues == 'none':
+            self.fill_pvalues()
+        pval = 'NA' if self.pvals[i] is None else round(self.pvals[i], 3)
+        outstring = [ngram, round(self.insepvals[i], 2), self.n[i], self.firsts[i], self.lasts[i], pval]
+        return '\t'.join(str(x) for x in outstring)
+
+    def __iter__(self):
+        return iter(self.ngrams)
+
+    def __len__(self):
+        return len(self.ngrams)
+
+
 def bidir_prob_wrapper(featpath, datapath, **kwargs):
     '''
     a wrapper function for insep. featpath leads to Features.txt, and datapath leads to LearningData.txt
+    threshold and pvalues (default 'lazy') in kwargs are passed on to insep_matrix
+    gramsize in kwargs (default 2) sets the length of the clusters; anything longer than 2 is counted with ngramcounter.count_ngrams
+    datapath can also be a corpusindex.CorpusIndex; a path is read only once, and both counts come from the same index.
+    if datapath is an ngramcounter.RunningCounts, nothing is counted: the matrix is filled in from the stored counts
     '''
+    if not isinstance(datapath, ngc.RunningCounts):
+        datapath = ci.load(datapath)
     if 'vowels' in kwargs and kwargs['vowels']:
         msg.env_render(message='\nGetting vocoids...', **kwargs)
         conslist = pnc.get_vocoids(featpath, **kwargs)
@@ -144,16 +295,26 @@ def bidir_prob_wrapper(featpath, datapath, **kwargs):
         conslist = pnc.get_consonants(featpath, **kwargs)
     msg.env_render(message='\n'+', '.join(conslist)+'\n', **kwargs)
     msg.env_render(message="\nGetting clusters...", **kwargs)
-    clustlist = list_clusters(conslist, 2)
     msg.env_render(message="\nCounting clusters...", **kwargs)
-    clustercount = count_clusters(clustlist, datapath, 2)
+    gramsize = kwargs.get('gramsize', 2)
+    if not gramsize == 2:
+        clustercount = ngc.count_ngrams(conslist, datapath, gramsize)
+    elif isinstance(datapath, ngc.RunningCounts):
+        clustercount = datapath.cluster_counts(conslist)
+    else:
+        clustercount = ngc.count_matrix(conslist, datapath)
     msg.env_render(message="\nCalculating probabilities...", **kwargs)
-    d= uni_counts(conslist, datapath)
-    bidic = insep(clustercount, d)
+    #p-values are only needed right away for clusters that can pass the threshold
+    bidic = insep(clustercount, clustercount.unigram_dict(), threshold=kwargs.get('threshold'), pvalues=kwargs.get('pvalues', 'lazy'))
     return bidic
 
 
 def write_insep(d, outpath):
+    '''
+    d is the (tpd, countd) tuple returned by insep, or an ngramcounter.ClusterCounts or NgramCounts to run insep on first
+    '''
+    if isinstance(d, (ngc.ClusterCounts, ngc.NgramCounts)):
+        d = insep(d, d.unigram_dict())
     with open(outpath, 'w', encoding='utf-8') as f:
         f.write("\t".join(["ngram", "insep", "N(C1C2)", "N(C1)", "N(C2)", "p(C1C2)"])+'\n')
         for k in sorted(d[0], key=d[0].get, reverse=True):
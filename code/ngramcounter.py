@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+counting engines for segment sequences, built on top of corpusindex.
+
+count_matrix fills a dense C x C numpy array of bigram counts for a list of C segments (usually the consonants) in one pass over the corpus token array, instead of checking every possible cluster against every word.
+
+>>> import ngramcounter as ngc
+>>> counts = ngc.count_matrix(['p', 't', 'k', 's'], '/home/you/LearningData.txt')
+>>> counts.matrix[counts.index['t'], counts.index['s']]
+412
+
+count_ngrams is the sparse version, for ngrams of any length: it only stores the ngrams that actually occur, as rows of segment positions, so trigrams and tetragrams over a big inventory never turn into C**3 or C**4 cells.
+
+>>> trigrams = ngc.count_ngrams(['m', 'n', 'ŋ', 'ɡ', 'b', 'k', 'p'], '/home/you/data/ngbaka/LearningData.txt', 3)
+>>> trigrams.as_dict()
+{'m ɡ b': 380, 'ŋ m ɡ': 380, 'ŋ ɡ n': 1}
+
+natclasscounter.insep and natclasscounter.write_insep take the ClusterCounts and NgramCounts objects directly.
+'''
+
+import numpy as np
+
+import corpusindex as ci
+import ldreader as ldr
+import rewriter as rw
+
+
+class ClusterCounts:
+    '''
+    bigram and unigram counts over a fixed list of segments.
+    segs: the segment list, usually consonants, in Features.txt order
+    index: {seg: row/column number}
+    matrix: C x C array, matrix[i, j] is the number of times segs[i] is immediately followed by segs[j] within a word
+    unigrams: length C array, how often each seg occurs anywhere in the data
+    '''
+
+    def __init__(self, segs, matrix, unigrams):
+        self.segs = list(segs)
+        self.index = {seg: i for (i, seg) in enumerate(self.segs)}
+        self.matrix = matrix
+        self.unigrams = unigrams
+
+    def total(self):
+        '''
+        the number of all bigrams of segs in the data
+        '''
+        return int(self.matrix.sum())
+
+    def unigram_dict(self):
+        '''
+        unigram counts as a dictionary, the way uni_counts returns them
+        '''
+        return dict(zip(self.segs, self.unigrams.tolist()))
+
+    def as_dict(self):
+        '''
+        cluster counts as a dictionary with every possible 'x y' key, the way count_clusters returns them
+        '''
+        counts = self.matrix.tolist()
+        return {self.segs[i]+' '+self.segs[j]: counts[i][j] for i in range(len(self.segs)) for j in range(len(self.segs))}
+
+    def to_ngrams(self):
+        '''
+        the non-zero cells of the matrix as an NgramCounts object, in row-major order
+        '''
+        rows, cols = np.nonzero(self.matrix)
+        return NgramCounts(self.segs, np.stack([rows, cols], axis=1), self.matrix[rows, cols], self.unigrams)
+
+
+class NgramCounts:
+    '''
+    counts of the ngrams of a fixed list of segments that occur in the data. ngrams that do not occur are not stored.
+    segs, index: as in ClusterCounts
+    grams: k x gramsize array; each row is an observed ngram, as positions in segs. rows are sorted, so they come in the same order as itertools.product(segs, repeat=gramsize)
+    counts: length k array, how often each ngram occurs
+    unigrams: length C array, how often each seg occurs anywhere in the data
+    '''
+
+    def __init__(self, segs, grams, counts, unigrams):
+        self.segs = list(segs)
+        self.index = {seg: i for (i, seg) in enumerate(self.segs)}
+        self.grams = np.asarray(grams, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.unigrams = unigrams
+        self.gramsize = self.grams.shape[1]
+
+    def total(self):
+        '''
+        the number of all ngrams of segs in the data
+        '''
+        return int(self.counts.sum())
+
+    def unigram_dict(self):
+        return dict(zip(self.segs, self.unigrams.tolist()))
+
+    def names(self):
+        '''
+        the ngrams as space-separated strings, 'ŋ ɡ b'
+        '''
+        return [' '.join(self.segs[i] for i in gram) for gram in self.grams.tolist()]
+
+    def as_dict(self):
+        '''
+        {ngram: count}, for the observed ngrams only
+        '''
+        return dict(zip(self.names(), self.counts.tolist()))
+
+    def position_counts(self, position):
+        '''
+        how often each seg occurs at position (0 for first, -1 for last) of an ngram. returns a length C array
+        '''
+        return np.bincount(self.grams[:, position], weights=self.counts, minlength=len(self.segs)).astype(np.int64)
+
+
+def pack(grams, base):
+    '''
+    turns each row of a 2d array of positions into a single integer, so rows can be sorted and counted as numbers
+    '''
+    packed = np.zeros(len(grams), dtype=np.int64)
+    for k in range(grams.shape[1]):
+        packed = packed*base + grams[:, k]
+    return packed
+
+
+def unpack(packed, base, gramsize):
+    grams = np.empty((len(packed), gramsize), dtype=np.int64)
+    for k in range(gramsize-1, -1, -1):
+        grams[:, k] = packed % base
+        packed = packed // base
+    return grams
+
+
+def bigram_matrix(seglist, corpus):
+    '''
+    counts every bigram of segments in seglist in one pass over the corpus token array.
+    returns a len(seglist) x len(seglist) array of counts
+    '''
+    c = len(seglist)
+    pos = corpus.lookup(seglist)
+    pairs = pos[corpus.windows(2)]
+    pairs = pairs[(pairs[:, 0] >= 0) & (pairs[:, 1] >= 0)]
+    return np.bincount(pairs[:, 0]*c + pairs[:, 1], minlength=c*c).reshape(c, c)
+
+
+def count_ngrams(seglist, datapath, gramsize):
+    '''
+    seglist is a list of segments, e.g. from pynatclasses.get_consonants
+    datapath is a path to LearningData.txt, a corpusindex.CorpusIndex or a RunningCounts
+    gramsize is the length of the ngrams
+    counts every ngram made up only of segments in seglist, in one pass over the token array, and keeps only the ones that occur.
+    returns an NgramCounts object
+    '''
+    if isinstance(datapath, RunningCounts):
+        corpus = ci.CorpusIndex.from_words(datapath.words)
+    else:
+        corpus = ci.load(datapath)
+    c = max(len(seglist), 1)
+    pos = corpus.lookup(seglist)[corpus.windows(gramsize)]
+    pos = pos[(pos >= 0).all(axis=1)]
+    keys, counts = np.unique(pack(pos, c), return_counts=True)
+    return NgramCounts(seglist, unpack(keys, c, gramsize), counts, unigram_vector(seglist, corpus))
+
+
+def unigram_vector(seglist, corpus):
+    '''
+    how often each segment in seglist occurs in a corpusindex.CorpusIndex, as an array
+    '''
+    symcounts = corpus.symbol_counts()
+    return np.array([symcounts[corpus.ids[seg]] if seg in corpus.ids else 0 for seg in seglist], dtype=np.int64)
+
+
+def count_matrix(seglist, datapath):
+    '''
+    seglist is a list of segments, e.g. from pynatclasses.get_consonants
+    datapath is a path to LearningData.txt or a corpusindex.CorpusIndex
+    returns a ClusterCounts object with the bigram matrix and unigram counts
+    '''
+    corpus = ci.load(datapath)
+    return ClusterCounts(seglist, bigram_matrix(seglist, corpus), unigram_vector(seglist, corpus))
+
+
+class RunningCounts:
+    '''
+    unigram and bigram counts over every segment in a corpus, kept in memory between complexify iterations.
+    when clusters are merged into complex segments, only the words that contained them are recounted: their old ngrams are subtracted and their new ones added.
+    words: the data, a list of segment lists (one per line)
+    tails: the extra tab columns of each line, or None
+    unigrams: {seg: count}
+    bigrams: {(seg1, seg2): count}
+    '''
+
+    def __init__(self, corpus):
+        self.words = list(corpus.words())
+        self.tails = corpus.tails
+        symcounts = corpus.symbol_counts().tolist()
+        self.unigrams = {seg: n for (seg, n) in zip(corpus.symbols, symcounts) if n}
+        #which words contain which bigram. the original data is indexed as a sorted array of packed bigram keys;
+        #words that change later are indexed in a small dictionary instead
+        self.corpus = corpus
+        base = max(len(corpus.symbols), 1)
+        grams = corpus.windows(2).astype(np.int64)
+        packed = grams[:, 0]*base + grams[:, 1]
+        wordof = np.repeat(np.arange(len(corpus)), np.maximum(np.diff(corpus.offsets)-1, 0))
+        order = np.argsort(packed, kind='stable')
+        self._keys = packed[order]
+        self._wordof = wordof[order]
+        self.postings = {}
+        keys, counts = np.unique(packed, return_counts=True)
+        self.bigrams = {(corpus.symbols[k // base], corpus.symbols[k % base]): n for (k, n) in zip(keys.tolist(), counts.tolist())}
+
+    @classmethod
+    def from_corpus(cls, datapath):
+        '''
+        datapath is a path to LearningData.txt or a corpusindex.CorpusIndex
+        '''
+        return cls(ci.load(datapath))
+
+    def copy(self):
+        '''
+        a copy that can be merged without changing this one. the original data and its index are shared
+        '''
+        new = RunningCounts.__new__(RunningCounts)
+        new.__dict__.update(self.__dict__)
+        #merge() replaces words rather than changing them, so a shallow copy of the list is enough
+        new.words = list(self.words)
+        new.unigrams = dict(self.unigrams)
+        new.bigrams = dict(self.bigrams)
+        new.postings = {k: set(v) for (k, v) in self.postings.items()}
+        return new
+
+    def words_with(self, bigram):
+        '''
+        word numbers that contain (or once contained) bigram. may include words that have since been rewritten; merge() checks
+        '''
+        found = set(self.postings.get(bigram, ()))
+        ids = self.corpus.ids
+        if bigram[0] in ids and bigram[1] in ids:
+            key = ids[bigram[0]]*max(len(self.corpus.symbols), 1) + ids[bigram[1]]
+            lo, hi = np.searchsorted(self._keys, [key, key+1])
+            found.update(self._wordof[lo:hi].tolist())
+        return found
+
+    def _add(self, word, idx, sign):
+        for seg in word:
+            self.unigrams[seg] = self.unigrams.get(seg, 0) + sign
+            if not self.unigrams[seg]:
+                del self.unigrams[seg]
+        for pair in zip(word, word[1:]):
+            self.bigrams[pair] = self.bigrams.get(pair, 0) + sign
+            if not self.bigrams[pair]:
+                del self.bigrams[pair]
+            if sign > 0:
+                self.postings.setdefault(pair, set()).add(idx)
+
+    def merge(self, clustlist):
+        '''
+        clustlist is a list of 'x y' clusters, highest priority first (see compseg.write_new_ld_file)
+        rewrites every word that contains one of them, and updates the counts for those words only.
+        returns the number of words that changed
+        '''
+        merger = rw.ClusterRewriter(clustlist)
+        candidates = set()
+        for clust in merger.clusters:
+            candidates.update(self.words_with(clust[:2]))
+        changed = 0
+        for idx in sorted(candidates):
+            old = self.words[idx]
+            new = merger.rewrite(old)
+            if new is not old:
+                self._add(old, idx, -1)
+                self._add(new, idx, 1)
+                self.words[idx] = new
+                changed += 1
+        return changed
+
+    def cluster_counts(self, seglist):
+        '''
+        returns a ClusterCounts object for the segments in seglist, built from the stored counts without looking at the data
+        '''
+        c = len(seglist)
+        index = {seg: i for (i, seg) in enumerate(seglist)}
+        matrix = np.zeros((c, c), dtype=np.int64)
+        for ((x, y), n) in self.bigrams.items():
+            if x in index and y in index:
+                matrix[index[x], index[y]] = n
+        unigrams = np.array([self.unigrams.get(seg, 0) for seg in seglist], dtype=np.int64)
+        return ClusterCounts(seglist, matrix, unigrams)
+
+    def segments(self):
+        '''
+        the segments that currently occur in the data
+        '''
+        return list(self.unigrams)
+
+    def write(self, outpath):
+        '''
+        writes the current version of the data to outpath, in LearningData.txt format
+        '''
+        write_words(outpath, self.words, self.tails)
+
+
+def write_words(outpath, words, tails=None):
+    '''
+    writes a list of segment lists to outpath, one word per line, with the tab columns in tails (if any) put back. outpath ending in .gz, .bz2 or .xz is written compressed
+    '''
+    with ldr.open_ld(outpath, 'w') as out:
+        for (i, word) in enumerate(words):
+            if tails and tails[i] is not None:
+                out.write(' '.join(word)+'\t'+tails[i]+'\n')
+            else:
+                out.write(' '.join(word)+'\n')
+
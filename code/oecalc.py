@@ -27,6 +27,14 @@ from the command line (e.g., bash):
 
 $ oecalc yourdatafile.txt 'p t k b d g' local
 
+or, for O/E of every trigram on a projection (here, vowel triples):
+
+$ oecalc yourdatafile.txt 'a e i o u' trigrams
+
+or, for O/E tables at distances 1 to 5 (with nonlocal, distance is counted on the projection onto the segments):
+
+$ oecalc yourdatafile.txt 'p t k b d g' distances 5 nonlocal
+
 
 you can import the module into an interactive python3 shell:
 
@@ -41,11 +49,195 @@ start python3 however you always do it, import oecalc, and call help(oecalc)
 
 
 
-from itertools import product
+import os
 import re
-from nltk import ngrams
+import heapq
+from collections import OrderedDict
+
+import numpy as np
+
+import corpusindex as ci
+import ldreader as ldr
+import ngramcounter as ngc
+import tiers as tr
+
+class OEResult:
+    '''
+    observed and expected counts for every ordered pair of segments in seglist, as numpy arrays: cell [i, j] is for the pair seglist[i] seglist[j].
+    seglist: the segments, in the order given (each one once)
+    index: {seg: row/column number}
+    observed: S x S array of pair counts
+    firsts, seconds: how often each segment is the first/second member of a counted pair
+    paircount: the number of all pairs, the denominator for expected
+    expected: S x S array, firsts[i]*seconds[j]/paircount
+    made by oe_matrices; makeOETable and makeCountTable both take one as result=
+    '''
+
+    def __init__(self, seglist, observed, paircount):
+        self.seglist = list(seglist)
+        self.index = {seg: i for (i, seg) in enumerate(self.seglist)}
+        self.observed = observed
+        self.paircount = paircount
+        self.firsts = observed.sum(axis=1)
+        self.seconds = observed.sum(axis=0)
+        if paircount:
+            self.expected = np.outer(self.firsts, self.seconds)/paircount
+        else:
+            self.expected = np.zeros(observed.shape)
+
+    def oe(self):
+        '''
+        the O/E matrix; nan where nothing is expected
+        '''
+        out = np.full(self.observed.shape, np.nan)
+        np.divide(self.observed, self.expected, out=out, where=self.expected != 0)
+        return out
+
+    def as_dict(self):
+        '''
+        the dictionary OEcalc returns: {'s1 s2': {'observed': .., 'expected': .., 'OE': .., 'OErnd': ..}}, with 'NA' for O/E where nothing is expected
+        '''
+        observed = self.observed.tolist()
+        expected = self.expected.tolist()
+        oe = self.oe().tolist()
+        pairs = {}
+        for (i, seg1) in enumerate(self.seglist):
+            for (j, seg2) in enumerate(self.seglist):
+                if expected[i][j] == 0:
+                    pairs[seg1+' '+seg2] = {'observed': observed[i][j], 'expected': expected[i][j], 'OE': 'NA', 'OErnd': 'NA'}
+                else:
+                    pairs[seg1+' '+seg2] = {'observed': observed[i][j], 'expected': expected[i][j], 'OE': oe[i][j], 'OErnd': round(oe[i][j], 3)}
+        return pairs
+
+
+def oe_matrices(filepath, segs, local):
+    '''
+    counts the pairs for O/E in one pass over the corpus token array, and returns an OEResult.
+    filepath and local are as in OEcalc; segs is a space-separated string or a list of segments.
+    local: every adjacent pair of segments counts towards the total, and the pairs of segs in segs are counted
+    nonlocal: words are first projected onto segs (everything else is taken out), and the adjacent pairs on the projection are counted
+    '''
+    seglist = list(dict.fromkeys(segs.strip().split(' ') if isinstance(segs, str) else segs))
+    if not isinstance(filepath, ci.CorpusIndex) and not ci.is_compiled(filepath) and not ldr.exists(filepath):
+        print("please make sure there is a file to read at the location.")
+    corpus = ci.load(filepath)
+    s = len(seglist)
+    table = corpus.lookup(seglist)
+    if local:
+        grams = table[corpus.windows(2)]
+        paircount = len(grams)
+        firsts = grams[:, 0]
+        seconds = grams[:, 1]
+    else:
+        grams = projected_windows(corpus, seglist, 2)
+        paircount = len(grams)
+        firsts = grams[:, 0]
+        seconds = grams[:, 1]
+    both = (firsts >= 0) & (seconds >= 0)
+    observed = np.bincount(firsts[both]*s + seconds[both], minlength=s*s).reshape(s, s)
+    return OEResult(seglist, observed, paircount)
+
+
+class DistanceOE:
+    '''
+    observed and expected counts for every ordered pair of segments in seglist, at distances 1 to maxdist, stacked into maxdist x S x S arrays: cell [d-1, i, j] is for seglist[i] followed d segments later by seglist[j].
+    paircounts: the number of all pairs at each distance, the denominators for expected
+    made by oe_distances. at(d) gives the OEResult for one distance, which makeOETable and makeCountTable take as result=
+    '''
+
+    def __init__(self, seglist, observed, paircounts, projection=None):
+        self.seglist = list(seglist)
+        self.index = {seg: i for (i, seg) in enumerate(self.seglist)}
+        self.observed = observed
+        self.paircounts = np.asarray(paircounts, dtype=np.int64)
+        self.projection = projection
+        self.maxdist = observed.shape[0]
+        firsts = observed.sum(axis=2)
+        seconds = observed.sum(axis=1)
+        denom = np.where(self.paircounts == 0, 1, self.paircounts)
+        self.expected = firsts[:, :, None]*seconds[:, None, :]/denom[:, None, None]
+
+    def at(self, distance):
+        return OEResult(self.seglist, self.observed[distance-1], int(self.paircounts[distance-1]))
+
+    def oe(self):
+        '''
+        the maxdist x S x S O/E tensor; nan where nothing is expected
+        '''
+        out = np.full(self.observed.shape, np.nan)
+        np.divide(self.observed, self.expected, out=out, where=self.expected != 0)
+        return out
+
+
+def oe_distances(filepath, segs, maxdist=5, projection=None):
+    '''
+    O/E for pairs of segs at every distance from 1 to maxdist, from one pass over the corpus token array. returns a DistanceOE.
+    filepath is as in OEcalc; segs and projection are space-separated strings or lists of segments.
+    distance is counted in segments: 1 is adjacent, 2 has one segment in between, and so on. pairs do not cross word boundaries.
+    without a projection, distance is counted over the whole word; with one (a tiers.Projection, a list of segments or a space-separated string), words are first projected onto it (e.g., all the consonants), and distance is counted on the projection.
+    at each distance, every pair counts towards the total and the pairs of segs in segs are counted, so distance 1 is OEcalc with local=True (no projection), or with local=False (projection=segs)
+    '''
+    seglist = list(dict.fromkeys(segs.strip().split(' ') if isinstance(segs, str) else segs))
+    corpus = ci.load(filepath)
+    s = len(seglist)
+    if projection is not None:
+        projection = tr.projection(projection)
+        #the tier has the same segment IDs and words as the corpus
+        stream = tr.tier(corpus, projection)
+    else:
+        stream = corpus
+    wordids = np.repeat(np.arange(len(stream)), np.diff(stream.offsets))
+    pos = corpus.lookup(seglist)[stream.tokens]
+    keys = []
+    paircounts = []
+    for d in range(1, maxdist+1):
+        nstarts = max(len(pos)-d, 0)
+        starts = np.nonzero(wordids[:nstarts] == wordids[d:d+nstarts])[0]
+        paircounts.append(len(starts))
+        firsts = pos[starts]
+        seconds = pos[starts+d]
+        both = (firsts >= 0) & (seconds >= 0)
+        keys.append((d-1)*s*s + firsts[both]*s + seconds[both])
+    observed = np.bincount(np.concatenate(keys), minlength=maxdist*s*s).reshape(maxdist, s, s)
+    return DistanceOE(seglist, observed, paircounts, projection)
+
+
+def makeDistanceReport(**pars):
+    '''
+    the O/E tables for every distance, one after another, each headed by its distance and number of pairs.
+    takes filepath, segs, maxdist (default 5), projection (default none) and rounded as in makeOETable, or result= a DistanceOE
+    with raw=True, the observed and expected tables (makeCountTable) are given instead
+    '''
+    segs = pars['segs']
+    result = pars['result'] if 'result' in pars else oe_distances(pars['filepath'], segs, pars.get('maxdist', 5), pars.get('projection'))
+    rows = []
+    for d in range(1, result.maxdist+1):
+        if rows:
+            rows.append('')
+        rows.append(f'distance {d}\t{result.paircounts[d-1]} pairs')
+        if pars.get('raw'):
+            rows.extend(makeCountTable(segs=segs, result=result.at(d)))
+        else:
+            rows.extend(makeOETable(segs=segs, result=result.at(d), rounded=pars.get('rounded', True)))
+    return rows
+
+
+def writeDistanceOE(filepath, segs, outfilepath, maxdist=5, projection=None, rounded=True):
+    '''
+    saves the O/E tables for distances 1 to maxdist to outfilepath (see makeDistanceReport)
+    '''
+    out = makeDistanceReport(segs=segs, result=oe_distances(filepath, segs, maxdist, projection), rounded=rounded)
+    with open(outfilepath, 'w', encoding='utf-8') as f:
+        for row in out:
+            f.write(row+'\n')
 
-# make a dictionary of pairs of segs and collect their O/E values into it
+
+def projected_windows(corpus, seglist, gramsize):
+    '''
+    projects every word in a corpusindex.CorpusIndex onto seglist (everything else is taken out), and returns the ngrams of length gramsize on the projection, as rows of positions in seglist. ngrams do not cross word boundaries
+    the projection is the tier from tiers.tier, which is made once per corpus and seglist
+    '''
+    return corpus.lookup(seglist)[tr.tier(corpus, seglist).windows(gramsize)]
 
 
 def OEcalc(**pars):
@@ -66,52 +258,10 @@ def OEcalc(**pars):
     the function will return unrounded OE, as well as a value rounded to the parameter given by the "rounded" argument.
     Defaults to 2, so an O/E value of 1.3432 will be printed as 1.34.
     *local* is boolean and determines whether segment pairs are adjacent (e.g., "p a" in "p a t i") or nonlocal (as in "p t" in "p a t i") 
+    *filepath* can also be a corpusindex.CorpusIndex, in which case nothing is read from disk, or a compiled corpus directory (see corpusindex)
+    the counting is done by oe_matrices; this returns its result as a dictionary of pairs
     '''
-    filepath = pars['filepath']
-    segs = pars['segs']
-    local = pars['local']
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            words =f.readlines()
-    except FileNotFoundError:
-        print("please make sure there is a file to read at the location.")
-        pass
-    seglist = segs.strip().split(' ')
-    wordlist = [x.strip().split(' ') for x in words]
-    pairs = {}.fromkeys(' '.join(list(x)) for x in product(seglist, repeat=2)) #creates a dictionary with S1,S2 pairs from seglist, every possible combination
-    segs = {} #reusing variable because that's a good thing
-    for seg in seglist:
-        segs[seg+'1']=0 #initializing positional frequency counts at zero; segs and pairs are counted separately in diff dictionaries
-        segs[seg+'2']=0
-    for x in pairs:
-        pairs[x] = {'observed':0, 'expected':0}
-    paircount = 0
-    for word in wordlist:
-        if not local:
-            wrd = [x for x in word if x in seglist]
-        else:
-            wrd = word
-        if len(wrd)<2:
-                continue
-        else:
-                segpairsinword = [wrd[x]+' ' + wrd[x+1] for x in range(0, len(wrd)-1)] #a list of 2-seg pairs in the word
-                paircount += len(segpairsinword)
-                for pair in segpairsinword:
-                    if pair in pairs:
-                        pairs[pair]['observed']+=1
-                        segs[pair.split(' ')[0]+'1'] += 1 #count actual observed freq of seg 1 in pair
-                        segs[pair.split(' ')[1]+'2'] += 1 #count actual observed freq of seg 2 in pair
-    for pair in pairs:
-            pr = pair.split(" ")
-            seg1,seg2 = pr[0],pr[1]
-            pairs[pair]['expected'] = segs[seg1+'1']*segs[seg2+'2']/paircount
-            try:
-                pairs[pair]['OE'] = pairs[pair]['observed']/pairs[pair]['expected']
-                pairs[pair]['OErnd']=round(pairs[pair]['OE'],3)
-            except ZeroDivisionError:
-                pairs[pair]['OE'] = 'NA'
-                pairs[pair]['OErnd']='NA'
-    return(pairs)
+    return oe_matrices(pars['filepath'], pars['segs'], pars['local']).as_dict()
 
 
 # make the dictionary printable   
@@ -119,28 +269,30 @@ def OEcalc(**pars):
 def makeOETable(**pars):
     '''
     arranges the O/E values and sorts them into a table for display.
-    the input should be the dictionary that's returned by pairOEcalc()
     output is a list of tab-separated lines that, if printed, looks like a table
+    takes the same arguments as OEcalc, or result= an OEResult from oe_matrices, so the counts are not done again
     '''
-    filepath = pars['filepath']
     segs = pars['segs']
-    local = pars['local']
     if 'rounded' in pars:
         rounded = pars['rounded']
     else:
         rounded=True
-    pairsdic = OEcalc(**pars)
+    result = pars['result'] if 'result' in pars else oe_matrices(pars['filepath'], segs, pars['local'])
+    oe = result.oe().tolist()
     seglist = segs.strip().split(' ')
     header = '\t'+'\t'.join(seglist)
     rows = [header]
     for seg in seglist:
         row = [seg]
+        i = result.index[seg]
         for otherseg in seglist:
-            pair = seg+" "+otherseg
-            if rounded:
-                row.append(str(pairsdic[pair]['OErnd']))
+            val = oe[i][result.index[otherseg]]
+            if result.expected[i, result.index[otherseg]] == 0:
+                row.append('NA')
+            elif rounded:
+                row.append(str(round(val, 3)))
             else:
-                row.append(str(pairsdic[pair]['OE']))
+                row.append(str(val))
         outrow = '\t'.join(row)
         rows.append(outrow)
     return(rows)
@@ -150,22 +302,23 @@ def makeOETable(**pars):
 def makeCountTable(**pars):
         '''
         print how often each segment in a pair was observed and how often it was expected
-
+        takes the same arguments as OEcalc, or result= an OEResult from oe_matrices
         '''
-        filepath = pars['filepath']
         segs = pars['segs']
-        local = pars['local']
-        pairsdic=OEcalc(**pars)
+        result = pars['result'] if 'result' in pars else oe_matrices(pars['filepath'], segs, pars['local'])
+        observed = result.observed.tolist()
+        expected = result.expected.tolist()
         seglist = segs.strip().split(' ')
         header = '\t'+'\t'.join(seglist)
         rows = [header]
         for seg in seglist:
+                i = result.index[seg]
                 row1 = [seg+' observed']
                 row2 = [seg+' expected']
                 for otherseg in seglist:
-                        pair = seg+' '+otherseg
-                        row1.append(str(pairsdic[pair]['observed']))
-                        row2.append(str(round(pairsdic[pair]['expected'], 2)))
+                        j = result.index[otherseg]
+                        row1.append(str(observed[i][j]))
+                        row2.append(str(round(expected[i][j], 2)))
                 outrow1 = '\t'.join(row1)
                 outrow2 = '\t'.join(row2)
                 rows.append(outrow1)
@@ -174,20 +327,114 @@ def makeCountTable(**pars):
 
 
 #saves OE table to file
-def writeOE(filepath, segs, outfilepath, local, ounded=True):
+def writeOE(filepath, segs, outfilepath, local, rounded=True):
         '''
         filepath is where your wordlist is located.
         segs is the list of segments, space-separated, over which you want O/E calculated
         outfilepath is for recording the results
         if rounded is True, the output will be rounded to 3 decimals (otherwise its Python3s default for integers, which is unreadably long)
         '''
-        pairsdic = OEcalc(filepath, segs, local)
-        out = makeOETable(filepath, segs,local, rounded)
+        out = makeOETable(segs=segs, result=oe_matrices(filepath, segs, local), rounded=rounded)
         f = open(outfilepath, 'w', encoding='utf-8')
         for row in out:
             f.write(row+'\n')
         f.close()
 
+class TrigramOE:
+    '''
+    every trigram on a projection, counted in one pass by trigram_oe.
+    projection: the projected segments, each once
+    index: {seg: position in projection}
+    grams: T x 3 array of the trigrams that occur, as positions in projection
+    counts: how often each of those occurs
+    marginals: 3 x P array; marginals[k, i] is how many trigrams have projection[i] in position k
+    total: the number of all trigrams on the projection
+    trigrams that do not occur are not stored: their observed count, and so their O/E, is 0
+    '''
+
+    def __init__(self, projection, grams, counts, marginals, total):
+        self.projection = list(projection)
+        self.index = {seg: i for (i, seg) in enumerate(self.projection)}
+        self.grams = grams
+        self.counts = counts
+        self.marginals = marginals
+        self.total = total
+        self.lookup = {tuple(gram): n for (gram, n) in zip(grams.tolist(), counts.tolist())}
+
+    def positions(self, trigram):
+        '''
+        the positional frequency of each segment of trigram (a list of 3 segments): how many trigrams have that segment in that position
+        '''
+        return [int(self.marginals[k, self.index[seg]]) if seg in self.index else 0 for (k, seg) in enumerate(trigram)]
+
+    def observed(self, trigram):
+        if not all(seg in self.index for seg in trigram):
+            return 0
+        return self.lookup.get(tuple(self.index[seg] for seg in trigram), 0)
+
+    def expected(self, trigram):
+        '''
+        N(S1) * N(S2) * N(S3) / N of all trigrams. raises ZeroDivisionError if there are no trigrams on the projection
+        '''
+        m1, m2, m3 = self.positions(trigram)
+        return m1*m2*m3/self.total
+
+    def oe(self, trigram):
+        '''
+        O/E of one trigram (a list of 3 segments), or None if nothing is expected
+        '''
+        expected = self.expected(trigram)
+        if expected == 0:
+            return None
+        return self.observed(trigram)/expected
+
+    def table(self, topk=None):
+        '''
+        (trigram, observed, expected, O/E) for every trigram that occurs, highest O/E first. with topk, only that many, picked through a heap
+        '''
+        g = self.grams
+        expected = (self.marginals[0, g[:, 0]].astype(float)*self.marginals[1, g[:, 1]]*self.marginals[2, g[:, 2]]/self.total).tolist() if len(g) else []
+        counts = self.counts.tolist()
+        oe = [n/e for (n, e) in zip(counts, expected)]
+        if topk is None:
+            best = sorted(range(len(oe)), key=oe.__getitem__, reverse=True)
+        else:
+            best = heapq.nlargest(topk, range(len(oe)), key=oe.__getitem__)
+        return [(' '.join(self.projection[x] for x in g[i].tolist()), counts[i], expected[i], oe[i]) for i in best]
+
+
+#the trigram counts for the last few (corpus, projection) combinations
+TRIGRAMCACHESIZE = 16
+_trigramcache = OrderedDict()
+
+
+def trigram_oe(filepath, projection):
+    '''
+    projects every word onto projection once and counts all the trigrams on it, with their positional frequencies. returns a TrigramOE.
+    filepath is as in trigramOEcalc; projection is a space-separated string or a list of segments.
+    the result is remembered, so asking about more trigrams on the same corpus and projection does not read the corpus again
+    '''
+    projection = list(dict.fromkeys(projection.strip().split(' ') if isinstance(projection, str) else projection))
+    key = ci.source_key(filepath)
+    if key is not None:
+        key = (key, tuple(projection))
+        if key in _trigramcache:
+            _trigramcache.move_to_end(key)
+            return _trigramcache[key][1]
+    corpus = ci.load(filepath)
+    p = max(len(projection), 1)
+    grams = projected_windows(corpus, projection, 3)
+    keys, counts = np.unique(ngc.pack(grams, p), return_counts=True)
+    marginals = np.stack([np.bincount(grams[:, k], minlength=len(projection)) for k in range(3)])
+    result = TrigramOE(projection, ngc.unpack(keys, p, 3), counts, marginals, len(grams))
+    if key is not None:
+        #the corpus is kept with the result, so that its id is not reused while the entry is cached
+        _trigramcache[key] = (corpus, result)
+        while len(_trigramcache) > TRIGRAMCACHESIZE:
+            _trigramcache.popitem(last=False)
+    return result
+
+
 def trigramOEcalc(filepath, trigram, projection, verbose=False):
     '''
     arguments:
@@ -199,6 +446,8 @@ def trigramOEcalc(filepath, trigram, projection, verbose=False):
     s a mb u k i
     p t a k u
 
+    it can also be a corpusindex.CorpusIndex or a compiled corpus directory.
+
     The trigram argument is a specific non-local sequence that you want to evaluate. It must be parameterized against a specific projection. That is,
     say you want to see how often the sequence "a e i" occurs in a word. You presumably want to look at the nonlocal trigram of these vowels, but not include in your counts examples where other vowels intervene--that is, you want to count "p a t e k i" but not "p a t e u k i". In order to make this happen, add "a e i o u" as the projection that you are counting on.
 
@@ -206,46 +455,31 @@ def trigramOEcalc(filepath, trigram, projection, verbose=False):
     Expected: N(S1) * N(S2) * N(s3) / N of all trigrams
     Observed: N(S1S2S3)
     the function will return unrounded OE, as well as a value rounded to the parameter given by the "rounded" argument.
+    the counts come from trigram_oe, which does every trigram on the projection at once and remembers them, so the next trigram on the same projection is answered without reading the corpus
     '''
-    #some prep for counting
-    projection = projection.strip().split(' ')
+    result = trigram_oe(filepath, projection)
     trigram = trigram.strip().split(' ')
-    observed_counts=0
-    expec_dic={'seg1':0, 'seg2':0, 'seg3':0}
-    n_of_all_trigrams = 0
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for word in f:
-            projsegs = [x for x in word.strip().split(' ') if x in projection]
-            if len(projsegs)<3:
-                continue
-            if len(projsegs)==3 and projsegs!=trigram:
-                n_of_all_trigrams+=1
-                if projsegs[0] == trigram[0]:
-                    expec_dic['seg1']+=1
-                if projsegs[1] == trigram[1]:
-                    expec_dic['seg2']+=1
-                if projsegs[2] == trigram[2]:
-                    expec_dic['seg3']+=1
-            else:
-                for subtrig in ngrams(projsegs, 3):
-                    n_of_all_trigrams+=1
-                    if list(subtrig) == trigram:
-                        observed_counts+=1
-                    if subtrig[0]==trigram[0]:
-                        expec_dic['seg1']+=1
-                    if subtrig[1]==trigram[1]:
-                        expec_dic['seg2']+=1
-                    if subtrig[2]==trigram[2]:
-                        expec_dic['seg3']+=1
+    observed_counts = result.observed(trigram)
+    positions = result.positions(trigram)
     if verbose:
         print('observed counts for trigram %s : %s' % (' '.join(trigram), observed_counts))
-        print('number of all trigrams in wordlist: ' + str(n_of_all_trigrams))
-        print('positional frequencies for each segment:\n %s : %s \n %s : %s \n %s : %s' % (trigram[0], expec_dic['seg1'], trigram[1], expec_dic['seg2'], trigram[2], expec_dic['seg3']))
-    expected = expec_dic['seg1']*expec_dic['seg2']*expec_dic['seg3']/n_of_all_trigrams
+        print('number of all trigrams in wordlist: ' + str(result.total))
+        print('positional frequencies for each segment:\n %s : %s \n %s : %s \n %s : %s' % (trigram[0], positions[0], trigram[1], positions[1], trigram[2], positions[2]))
+    expected = result.expected(trigram)
     try:
         return round(observed_counts/expected,6)
     except ZeroDivisionError:
         print("The O/E is not undefined (division by zero)")
+
+
+def writeTrigramOE(filepath, projection, outfilepath, topk=None):
+    '''
+    writes O/E for every trigram that occurs on the projection (or the topk highest), highest first, from one pass over the corpus
+    '''
+    with open(outfilepath, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(['trigram', 'observed', 'expected', 'OE'])+'\n')
+        for (trigram, observed, expected, oe) in trigram_oe(filepath, projection).table(topk):
+            f.write(f'{trigram}\t{observed}\t{round(expected, 2)}\t{round(oe, 3)}\n')
         
            
 
@@ -253,20 +487,31 @@ def trigramOEcalc(filepath, trigram, projection, verbose=False):
 if __name__ == "__main__":
     import sys
     try:
-        filepath = [x for x in sys.argv if x.endswith('.txt')][0]
+        filepath = [x for x in sys.argv if x.endswith(('.txt', '.gz', '.bz2', '.xz')) or x == '-' or ci.is_compiled(x)][0]
         segs = [x for x in sys.argv if " " in x][0]
-        if 'local' in sys.argv:
-            local = True
-        elif 'nonlocal' in sys.argv:
-            local = False
+        if 'trigrams' in sys.argv:
+            table = ['\t'.join(['trigram', 'observed', 'expected', 'OE'])]
+            for (trigram, observed, expected, oe) in trigram_oe(filepath, segs).table():
+                table.append(f'{trigram}\t{observed}\t{round(expected, 2)}\t{round(oe, 3)}')
+        elif 'distances' in sys.argv:
+            #distances 1 to the number given (default 5); with nonlocal, counted on the projection onto segs
+            maxdist = ([int(x) for x in sys.argv[1:] if x.isdigit()] or [5])[0]
+            projection = segs if 'nonlocal' in sys.argv else None
+            table = makeDistanceReport(segs=segs, result=oe_distances(filepath, segs, maxdist, projection), raw='raw' in sys.argv)
         else:
-            print('Please specify whether you want to look at local or nonlocal co-occurrence of your segments. Enter either "local" or "nonlocal."') 
-        if 'raw' in sys.argv:
-            table = makeCountTable(filepath, segs, local)
-        else: 
-            table = makeOETable(filepath, segs, local)
-            if len(table)==1:
-                print('something went wrong')
+            if 'local' in sys.argv:
+                local = True
+            elif 'nonlocal' in sys.argv:
+                local = False
+            else:
+                print('Please specify whether you want to look at local or nonlocal co-occurrence of your segments. Enter either "local" or "nonlocal."') 
+            result = oe_matrices(filepath, segs, local)
+            if 'raw' in sys.argv:
+                table = makeCountTable(segs=segs, result=result)
+            else: 
+                table = makeOETable(segs=segs, result=result)
+                if len(table)==1:
+                    print('something went wrong')
         for row in table:
             print(row)
     except:
@@ -84,7 +84,8 @@ def plot_all_vert(simpath, threshold, takefirst, show, ftype):
                 vals = line.strip().split('\t')
                 clusters.append(vals[0])
                 ins_vals.append(float(vals[1]))
-                if float(vals[5])>=0.05:
+                #NA: the p-value was not computed (see natclasscounter.insep_matrix)
+                if vals[5]!='NA' and float(vals[5])>=0.05:
                     p_vals.append('kX')
                 else:
                     p_vals.append(pttype)
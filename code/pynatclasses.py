@@ -4,7 +4,12 @@
 '''
 a module that identifies all unique natural classes defined by the feature combinations in a table of phonological features.
 
-dependencies are standard modules (itertools, sys, os)
+dependencies are standard modules (itertools, sys, os) and numpy
+
+FEATURE TABLE
+	FeatureTable.from_file(featfilepath), or load_table(featfilepath or featlines)
+	segs_to_feats, make_feat_vectors, get_consonants, get_vocoids and check_feats all read from one of these
+	load_table keeps the tables it builds in a cache (see featcache), so a feature file is only parsed once per process, and so are the structures derived from it
 
 The main functions:
 
@@ -24,18 +29,36 @@ Look through the rest for more
 import os
 import itertools
 import sys
+import threading
+from collections import OrderedDict
 
+import numpy as np
 
 import messages as msg
 
 
 
+#the most recently used feature tables, {key: FeatureTable}. a file is keyed by its full path, modification time and size, so an edited file is read again;
+#a (featnames, seglines) tuple is keyed by its contents
+FEATCACHESIZE = 64
+featcache = OrderedDict()
+#feature files can be written (and invalidated) from compseg's background writer thread
+featlock = threading.Lock()
+
+
 def read_feat_file(featfilepath, **kwargs):
 	'''
 	the input argument is a path to features.txt, tab-formatted according to Hayes and Wilson rules
 	returns a vector of feature names, and a vector of segments plus their feature values in order
 	featnames: [syll, cons, son, dor, ...]
 	seglines: [k, -, -, -, +, ...] 
+	the file is only parsed the first time (see load_table); every call gets its own copy of the lists
+	'''
+	return load_table(featfilepath, **kwargs).featlines()
+
+def parse_feat_file(featfilepath, **kwargs):
+	'''
+	reads the file at featfilepath, without looking in the cache. see read_feat_file
 	'''
 	try:
 		with open(featfilepath, 'r', encoding='utf-8') as f:
@@ -47,53 +70,219 @@ def read_feat_file(featfilepath, **kwargs):
 		msg.env_render(message=f'could not open {featfilepath}', **kwargs)
 		raise SystemExit
 
+def load_feats(source, **kwargs):
+	'''
+	source is either a path to features.txt or a (featnames, seglines) tuple that has already been read (see read_feat_file)
+	returns (featnames, seglines) either way, so functions can be handed a feature table that only exists in memory
+	'''
+	if isinstance(source, (tuple, list)):
+		return source
+	if isinstance(source, FeatureTable):
+		return source.featlines()
+	return read_feat_file(source, **kwargs)
+
+class FeatureTable:
+	'''
+	a feature file as a numpy matrix, one row per segment and one column per feature, with +1 for +, -1 for - and 0 for 0.
+	segs: segment symbols, in file order (a row index)
+	featnames: feature names, in file order (a column index)
+	segindex, featindex: {name: position} lookups going the other way
+	values: the segments x features int8 matrix
+	malformed: (seg, feat, value) for any cell that is not +, - or 0. those cells are stored as 0
+	'''
+
+	SIGNS = {'+': 1, '-': -1, '0': 0}
+
+	def __init__(self, featnames, seglines):
+		#the lines as they were read, for featlines()
+		self.lines = (list(featnames), [list(line) for line in seglines])
+		#derived structures, computed the first time they are asked for
+		self.memo = {}
+		self.featnames = list(featnames)
+		self.featindex = {}
+		for (i, feat) in enumerate(self.featnames):
+			self.featindex.setdefault(feat, i)
+		self.segs = [line[0] for line in seglines]
+		#a segment listed twice is looked up by its last line, as in segs_to_feats
+		self.segindex = {seg: i for (i, seg) in enumerate(self.segs)}
+		self.values = np.zeros((len(self.segs), len(self.featnames)), dtype=np.int8)
+		self.malformed = []
+		for (i, line) in enumerate(seglines):
+			for (j, feat) in enumerate(self.featnames):
+				value = line[j+1]
+				sign = self.SIGNS.get(value)
+				if sign is None:
+					self.malformed.append((line[0], feat, value))
+				else:
+					self.values[i, j] = sign
+
+	@classmethod
+	def from_file(cls, featfilepath, **kwargs):
+		return cls(*read_feat_file(featfilepath, **kwargs))
+
+	def featlines(self):
+		'''
+		the (featnames, seglines) tuple that read_feat_file would return for this table
+		'''
+		return (list(self.lines[0]), [list(line) for line in self.lines[1]])
+
+	def column(self, featvalue):
+		'''
+		featvalue is a feature with its value, like '-syll'. returns (column index, +1 or -1), or (None, sign) for a feature that is not in the table
+		'''
+		return (self.featindex.get(featvalue[1:]), self.SIGNS.get(featvalue[0]))
+
+	def mask(self, feats):
+		'''
+		feats is a list of feature values, like ['-son', '+cont']. returns a boolean array over the rows: True for the segments that have all of them
+		'''
+		mask = np.ones(len(self.segs), dtype=bool)
+		for featvalue in feats:
+			(j, sign) = self.column(featvalue)
+			if j is None or not sign:
+				return np.zeros(len(self.segs), dtype=bool)
+			mask &= self.values[:, j] == sign
+		return mask
+
+	def segs_with(self, feats):
+		'''
+		the segments that have every feature value in feats (a list, or a single value like '-syll'), in file order
+		'''
+		if isinstance(feats, str):
+			feats = [feats]
+		key = ('segs_with', tuple(feats))
+		if not key in self.memo:
+			self.memo[key] = [self.segs[i] for i in np.nonzero(self.mask(feats))[0].tolist()]
+		return list(self.memo[key])
+
+	def feat_specs(self, seg):
+		'''
+		the specified feature values of seg, like segs_to_feats: ['-syll', '+cons', ...]
+		'''
+		row = self.values[self.segindex[seg]]
+		return [('+' if row[j] > 0 else '-')+self.featnames[j] for j in np.nonzero(row)[0].tolist()]
+
+	def segdict(self):
+		'''
+		{seg: [+feat, -feat, ...]} for every segment. see segs_to_feats
+		'''
+		if not 'segdict' in self.memo:
+			self.memo['segdict'] = {seg: self.feat_specs(seg) for seg in self.segindex}
+		return {seg: list(v) for (seg, v) in self.memo['segdict'].items()}
+
+	def spec_matrix(self, segs=None):
+		'''
+		a boolean matrix with one row per segment (all of them, or the ones in segs) and two columns per feature, for + and -: each row is the set of feature values the segment has, as a bitset
+		'''
+		values = self.values if segs is None else self.values[[self.segindex[x] for x in segs]]
+		return np.concatenate([values == 1, values == -1], axis=1)
+
+	def seg_masks(self):
+		'''
+		{+feat: bitmask} for every feature value that at least one segment has. bit k of a mask stands for the k-th segment in segindex
+		'''
+		if not 'seg_masks' in self.memo:
+			values = self.values[list(self.segindex.values())]
+			masks = {}
+			for (feat, j) in self.featindex.items():
+				for (featvalue, sign) in [('+'+feat, 1), ('-'+feat, -1)]:
+					bits = np.nonzero(values[:, j] == sign)[0].tolist()
+					if bits:
+						masks[featvalue] = sum(1 << k for k in bits)
+			self.memo['seg_masks'] = masks
+		return dict(self.memo['seg_masks'])
+
+	def featdict(self):
+		'''
+		{+feat: [seg, seg, ...]} for every feature value that at least one segment has. see make_feat_vectors
+		'''
+		if not 'featdict' in self.memo:
+			featdict = {}
+			for (feat, j) in self.featindex.items():
+				col = self.values[:, j]
+				for (featvalue, sign) in [('+'+feat, 1), ('-'+feat, -1)]:
+					rows = np.nonzero(col == sign)[0].tolist()
+					if rows:
+						featdict[featvalue] = [self.segs[i] for i in rows]
+			self.memo['featdict'] = featdict
+		return {k: list(v) for (k, v) in self.memo['featdict'].items()}
+
+
+def load_table(source, **kwargs):
+	'''
+	source is a path to features.txt, a (featnames, seglines) tuple, or a FeatureTable. returns a FeatureTable
+	tables are cached (see featcache), and the same table is returned for the same unchanged file or the same lines, so the segment dictionary, natural classes, etc. that it remembers are shared by every caller. the least recently used table is dropped when there are more than FEATCACHESIZE
+	'''
+	if isinstance(source, FeatureTable):
+		return source
+	key = cache_key(source)
+	if key is not None:
+		with featlock:
+			table = featcache.get(key)
+			if table is not None:
+				featcache.move_to_end(key)
+				return table
+	if isinstance(source, (tuple, list)):
+		table = FeatureTable(*source)
+	else:
+		table = FeatureTable(*parse_feat_file(source, **kwargs))
+	if key is not None:
+		with featlock:
+			featcache[key] = table
+			while len(featcache) > FEATCACHESIZE:
+				featcache.popitem(last=False)
+	return table
+
+def cache_key(source):
+	'''
+	('file', full path, mtime in ns, size) for a path, ('lines', featnames, seglines) as tuples for lines in memory, or None if there is no file at the path
+	'''
+	if isinstance(source, (tuple, list)):
+		return ('lines', tuple(source[0]), tuple(tuple(line) for line in source[1]))
+	try:
+		st = os.stat(source)
+	except OSError:
+		return None
+	return ('file', os.path.abspath(source), st.st_mtime_ns, st.st_size)
+
+def invalidate(featfilepath=None):
+	'''
+	drops the cached tables for the file at featfilepath (all of them, if featfilepath is None). anything that writes a feature file should call this
+	'''
+	with featlock:
+		if featfilepath is None:
+			featcache.clear()
+			return
+		path = os.path.abspath(featfilepath)
+		for key in [k for k in featcache if k[0]=='file' and k[1]==path]:
+			del featcache[key]
+
 def segs_to_feats(featlines, **kwargs):
 	'''
-	takes as input a tuple: (featnames, seglines) see read_feat_file
+	takes as input a tuple: (featnames, seglines) see read_feat_file (or a FeatureTable)
 	returns a dictionary with segment name keys and +feat -feat lists as values
 	{k: [-syll, -cons, -son, +dor, ...], p: [], etc}
 	'''
-	featnames = featlines[0]
-	seglines = featlines[1]
-	segdict = {}
-	for line in seglines:
-		segdict[line[0]]=[]
-		for feat in featnames:
-			featvalue = line[featlines[0].index(feat)+1]
-			if not featvalue in ['+', '-', '0']:
-				kwargs['message']='Your feature file is malformed. Feature values have to be "+", "-", or "0".'
-				msg.env_render(**kwargs)
-			if not featvalue=='0':
-				segdict[line[0]].append(featvalue+feat)
-	return segdict
+	table = load_table(featlines, **kwargs)
+	report_malformed(table, **kwargs)
+	return table.segdict()
+
+def report_malformed(table, **kwargs):
+	for x in table.malformed:
+		kwargs['message']='Your feature file is malformed. Feature values have to be "+", "-", or "0".'
+		msg.env_render(**kwargs)
 
 
 def make_feat_vectors(featlines):
 	'''
-	takes as input a tuple: (featnames, seglines) see read_feat_file
+	takes as input a tuple: (featnames, seglines) see read_feat_file (or a FeatureTable)
 	returns a dictionary of feature values along with segments that have those feature values.
 	e.g.,
 {-syll: [k, t, p, w, j, n,...]}
         why is it called "make_feat_vectors"? who knows
+	feature values not associated with seg lists (e.g., -dorsal if dorsal is privative) are left out
 	'''
-	featdict = {}
-	for feat in featlines[0]:
-		featdict["+"+feat]=[]
-		featdict["-"+feat]=[]
-		featindex = featlines[0].index(feat)
-		for line in featlines[1]:
-			seg = line[0]
-			featvalue = line[featindex+1]
-			if featvalue=="+":
-				featdict['+'+feat].append(seg)
-			elif featvalue=="-":
-				featdict["-"+feat].append(seg)
-	#drop feature values not associated with seg lists (e.g., -dorsal if dorsal is privative)
-	finaldic = {}
-	for x in featdict:
-		if featdict[x]:
-			finaldic[x] = featdict[x] 
-	return finaldic 
+	return load_table(featlines).featdict()
 
 
 
@@ -101,11 +290,9 @@ def check_feats(featlines, **kwargs):
     '''
     returns seg and feat value if the feature specifications of one seg are a proper subset of the other. when this holds, the first seg cannot be uniquely identified using its features, so the user should be told.
     '''
-    segdict = segs_to_feats(featlines)
-    problemsegs = []
-    for seg, otherseg in itertools.combinations(segdict.keys(), 2):
-            if set(segdict[seg]).issubset(set(segdict[otherseg])):
-                problemsegs.append((seg, otherseg))
+    table = load_table(featlines)
+    report_malformed(table)
+    problemsegs = subset_pairs(table)
     if not problemsegs:
          kwargs['message'] = "\nThe new feature file is well-formed. all the segments can be uniquely identified.\n"
          msg.env_render(**kwargs)
@@ -120,35 +307,60 @@ def check_feats(featlines, **kwargs):
    
     
 
+def subset_pairs(table):
+    '''
+    every pair of segments (seg, otherseg), in itertools.combinations order, where the feature values of seg are a subset of those of otherseg.
+    each segment's values are a row of bits (see FeatureTable.spec_matrix), and seg is a subset of otherseg if none of its bits are missing from otherseg, so all the pairs are checked with one matrix product
+    '''
+    segs = list(table.segindex)
+    specs = table.spec_matrix(segs).astype(np.float32)
+    #missing[i, j]: how many of seg i's feature values seg j does not have (in floats, so that numpy hands the product to BLAS)
+    missing = specs @ (1-specs).T
+    rows, cols = np.nonzero(np.triu(missing == 0, k=1))
+    return [(segs[i], segs[j]) for (i, j) in zip(rows.tolist(), cols.tolist())]
+
 def get_nat_classes(featlines, **kwargs):
     '''
-    takes as input a tuple: (featnames, seglines) see read_feat_file
+    takes as input a tuple: (featnames, seglines) see read_feat_file (or a FeatureTable)
     returns a dictionary of natural classes as keys, and segments as values
     {-son,+cons: [p, t, n, l, ...]}
+    every set of segments that some combination of feature values picks out is a class, named by all the feature values its segments share (see closed_classes)
     '''
-    segdict = segs_to_feats(featlines)
-    featdict = make_feat_vectors(featlines)
-    #find all pairs of segs that share feature values:
-    natclasslist = featdict.keys()
-    print(natclasslist)
-    for seg in segdict:
-        for otherseg in segdict:
-            overlap = set(segdict[seg]) & set(segdict[otherseg])
-            if len(overlap)>0 and not overlap in natclasslist:
-                natclasslist.append(list(overlap))
-    natclassdic = {}
-    #compile lists of segments that natural classes expand to:
-    for cl in natclasslist:
-        clname = ','.join(sorted(cl))
-        natclassdic[clname]=[]
-        #for every seg, check if its feature values are in that natural class description
-        for seg in segdict:
-            if set(cl).issubset(set(segdict[seg])): 
-                natclassdic[clname].append(seg)
+    table = load_table(featlines)
+    if not 'natclasses' in table.memo:
+        segs = list(table.segindex)
+        natclassdic = {}
+        for (extent, intent) in closed_classes(table).items():
+            #a set of segments that no feature value picks out (e.g. all of them, in a file with no shared values) has no name
+            if intent:
+                natclassdic[','.join(sorted(intent))] = [seg for (k, seg) in enumerate(segs) if extent >> k & 1]
+        table.memo['natclasses'] = natclassdic
+    natclassdic = {k: list(v) for (k, v) in table.memo['natclasses'].items()}
     kwargs['message']=f'\nNumber of natural classes: {len(natclassdic)}'
     msg.env_render(**kwargs)
     return natclassdic
 
+def closed_classes(table):
+    '''
+    finds every natural class in a FeatureTable, formal concept analysis style.
+    a class is a set of segments (its extent), stored as a bitmask (see FeatureTable.seg_masks), and every extent is an intersection of the extents of some feature values. so starting from the extents of single feature values, the extents are intersected with each feature value's extent until nothing new turns up; a dictionary keyed by extent keeps each class once.
+    returns {extent: intent}, where the intent is the list of all the feature values that every segment in the class has
+    '''
+    masks = table.seg_masks()
+    attrs = list(dict.fromkeys(masks.values()))
+    found = dict.fromkeys(attrs)
+    frontier = attrs
+    while frontier:
+        new = []
+        for extent in frontier:
+            for m in attrs:
+                x = extent & m
+                if x and not x in found:
+                    found[x] = None
+                    new.append(x)
+        frontier = new
+    return {extent: [fv for (fv, m) in masks.items() if extent & m == extent] for extent in found}
+
 def feat_to_seg_lookup(feats, featdict):
     '''
     given a list of features (feats) and a dictionary of them (featdict), returns all the segs that have that feature combo
@@ -168,7 +380,7 @@ def feats_to_segs_wrapper(feats, featfilepath):
 	pynatclasses.feats_to_segs_wrapper(['-syll', '-son', '+cont'], /home/path/to/feats.txt')
 	this is just a wrapper for feat_to_seg_lookup, and it adds the extra step of opening the feature file (so this only happens once per feat line)
 	'''
-	featdict = make_feat_vectors(read_feat_file(featfilepath))
+	featdict = make_feat_vectors(load_table(featfilepath))
 	return feat_to_seg_lookup(feats, featdict)
 
 def powerset(thing):
@@ -203,73 +415,101 @@ def avg_cl_size(featdict, featlist):
 def find_shortest_descriptions(natclassdic, featlines):
 	'''
 	takes features from a verbose nat class dictionary, looks to see if there is a shorter subset of features that could describe same class, returns a less verbose dictionary of natural classes 
+	the subsets are tried by size, smallest first, and the search stops at the first size that picks out the class. if more than one subset of that size does, the one whose features cover the most segments on average wins (see avg_cl_size), and after that the first one.
+	subsets are compared as bitmasks over segments (see FeatureTable.seg_masks), and the bitmask of every subset is remembered, since the classes share a lot of them
 	'''
 	finaldic = {}
-	featdict = make_feat_vectors(featlines)
+	table = load_table(featlines)
+	featdict = table.featdict()
+	masks = table.seg_masks()
+	bits = {seg: k for (k, seg) in enumerate(table.segindex)}
+	memo = {}
 	for cl in sorted(natclassdic):
 		segs = sorted(natclassdic[cl])
 		feats = sorted(cl.split(','))
 		if len(feats)==1:
 			finaldic[cl]=segs
+			continue
+		if any(not x in bits for x in segs) or any(not x in masks for x in feats):
+			#features or segments that are not in the table cannot describe the class any better
+			finaldic[cl]=segs
+			continue
+		target = sum(1 << bits[x] for x in segs)
+		for size in range(1, len(feats)+1):
+			shortest = [list(x) for x in itertools.combinations(feats, size) if bundle_mask(x, masks, memo) == target]
+			if shortest:
+				break
+		if not shortest or size == len(feats):
+			finaldic[cl] = segs
+		elif len(shortest)==1:
+			finaldic[','.join(shortest[0])]=segs
 		else:
-			#takes every sub-combination of features in the verbose dic
-			#if any of them picks out an equiv. set of segs, takes the shortest 
-			equiv_classes = []
-			for featuple in powerset(feats):
-				if (not len(featuple)==0) and (feat_to_seg_lookup(list(featuple), featdict) == segs):
-					equiv_classes.append(sorted(list(featuple)))
-			if len(equiv_classes)==1:
-				finaldic[cl] = segs
-			else:
-				lenths = [len(x) for x in equiv_classes]
-				shortest=[x for x in equiv_classes if len(x)==min(lenths)]
-				if len(shortest)==1:
-					finaldic[','.join(shortest[0])]=segs
-				elif len(shortest)>1:
-					cl_sizes = [avg_cl_size(featdict, cl) for cl in equiv_classes]
-					#reward classes for using "bigger" features
-					generalest = [x for x in equiv_classes if avg_cl_size(featdict, x) == min(cl_sizes)]
-					#and then give up, just give the first if there are ties
-					finaldic[','.join(generalest[0])]=segs
+			cl_sizes = [avg_cl_size(featdict, x) for x in shortest]
+			#reward classes for using "bigger" features
+			generalest = [x for x in shortest if avg_cl_size(featdict, x) == min(cl_sizes)]
+			#and then give up, just give the first if there are ties
+			finaldic[','.join(generalest[0])]=segs
 	return finaldic
 
+def bundle_mask(bundle, masks, memo):
+	'''
+	the segments that have every feature value in bundle (a tuple), as a bitmask. memo remembers every bundle and its prefixes
+	'''
+	if bundle in memo:
+		return memo[bundle]
+	if len(bundle)==1:
+		mask = masks[bundle[0]]
+	else:
+		mask = bundle_mask(bundle[:-1], masks, memo) & masks[bundle[-1]]
+	memo[bundle] = mask
+	return mask
+
 def wrap_classes(featfilepath):
 	'''
 	takes in a full path to a feature file, Features.txt
         returns a dictionary of natural classes, and the segs they contain:
         natclassdict = {'-son,-cont': ['p', 't','k']...}
 	'''
-	featlines = read_feat_file(featfilepath)
-	return find_shortest_descriptions(get_nat_classes(featlines), featlines)
+	table = load_table(featfilepath)
+	natclassdic = get_nat_classes(table)
+	if not 'wrap_classes' in table.memo:
+		table.memo['wrap_classes'] = find_shortest_descriptions(natclassdic, table)
+	return {k: list(v) for (k, v) in table.memo['wrap_classes'].items()}
+
 
+def source_name(featfilepath):
+	'''
+	how messages name a feature file: the part of its path after "simulation" (or the whole path, if it is not in a simulation directory), or "in memory" for a feature table or feature lines that did not come from a file
+	'''
+	if isinstance(featfilepath, str):
+		return featfilepath.split("simulation", 1)[-1]
+	return "in memory"
 
 def get_consonants(featfilepath, **kwargs):
 	'''
-	given a full path to a features.txt file, returns a list of all the symbols that are specified as -syll or -syllabic. Those feature names are special.
+	given a full path to a features.txt file (or a feature table already in memory, see load_feats), returns a list of all the symbols that are specified as -syll or -syllabic. Those feature names are special.
         kwargs are passed on to messages module for error handling
 	'''
-	featlines = read_feat_file(featfilepath)
-	feats = make_feat_vectors(featlines)
-	if '-syll' in feats:
-		return feats['-syll']
-	elif '-syllabic' in feats:
-		return feats['-syllabic']
+	table = load_table(featfilepath)
+	for feat in ['-syll', '-syllabic']:
+		segs = table.segs_with(feat)
+		if segs:
+			return segs
 	else:
-		kwargs['message']=f'\nThe feature file {featfilepath.split("simulation")[1]} does not have a column for -syll or -syllabic. The learner needs this feature to separate consonants from vowels. Fix this and try again.'
+		kwargs['message']=f'\nThe feature file {source_name(featfilepath)} does not have a column for -syll or -syllabic. The learner needs this feature to separate consonants from vowels. Fix this and try again.'
 		msg.env_render(**kwargs)
 
 def get_vowels(featfilepath, **kwargs):
     '''
     first argument is a path to a features.txt file. returns a list of vowel and glide symbols. kwargs are passed to essages module for `error handling
     '''
-    featlines = read_feat_file(featfilepath)
-    feats = make_feat_vectors(featlines)
-    if '+syll' in feats:
-        return feats['+syll']
-    elif '+syllabic' in feats:
-        return feats['+syllabic']
+    table = load_table(featfilepath)
+    for feat in ['+syll', '+syllabic']:
+        segs = table.segs_with(feat)
+        if segs:
+            return segs
     else:
-        msg.env_render(message = 'f\nThe feature file {featfilepath.split("simulation")[1]} does not have a column for +syll or +syllabic. The learner needs this feature to separate vowels from true consonants. Fix this and try again.', **kwargs)
+        msg.env_render(message = f'\nThe feature file {source_name(featfilepath)} does not have a column for +syll or +syllabic. The learner needs this feature to separate vowels from true consonants. Fix this and try again.', **kwargs)
 
 
 
@@ -277,14 +517,13 @@ def get_vocoids(featfilepath, **kwargs):
     '''
     first argument is a path to a features.txt file. returns a list of vowel and glide symbols. kwargs are passed to essages module for `error handling
     '''
-    featlines = read_feat_file(featfilepath)
-    feats = make_feat_vectors(featlines)
-    if '-cons' in feats:
-        return feats['-cons']
-    elif '-consonantal' in feats:
-        return feats['-consonantal']
+    table = load_table(featfilepath)
+    for feat in ['-cons', '-consonantal']:
+        segs = table.segs_with(feat)
+        if segs:
+            return segs
     else:
-        msg.env_render(message=f'\nThe feature file {featfilepath.split("simulation")[1]} does not have a column for -cons or -consonantal. The learner needs this feature to separate vocoids from true consonants. Fix this and try again.', **kwargs)
+        msg.env_render(message=f'\nThe feature file {source_name(featfilepath)} does not have a column for -cons or -consonantal. The learner needs this feature to separate vocoids from true consonants. Fix this and try again.', **kwargs)
 
 
 def outwrite_classes(featfilepath, outpath):
@@ -328,11 +567,13 @@ def make_custom_proj(feats, featfilepath, outpath, **kwargs):
 	'''
 	featl = [x.strip() for x in feats.split(',')]
 	msg.env_render(message=f'\n{featl}', **kwargs)
-	thesegs = feats_to_segs_wrapper(feats, featfilepath)
-	feats_to_project = seglist_to_feats(thesegs, read_feat_file(featfilepath)).append('wb')
+	#the same segments tiers.Projection.from_feats(feats, featfilepath) projects onto
+	table = load_table(featfilepath)
+	thesegs = table.segs_with(featl)
+	feats_to_project = seglist_to_feats(thesegs, table.segdict()) + ['wb']
 	with open(outpath, 'w', encoding='utf-8') as f:
-		f.write('\t'.join(['default', 'any', 'all', '3']))
-		f.write('\t'.join([feats, ''.join(featl), ','.join(feats_to_project), '2', '3']))
+		f.write('\t'.join(['default', 'any', 'all', '3'])+'\n')
+		f.write('\t'.join([feats, ''.join(featl), ','.join(feats_to_project), '2', '3'])+'\n')
      
 
 
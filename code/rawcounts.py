@@ -19,17 +19,26 @@ $python3 rawcounts.py /home/you/filename.txt 'a'
 
 will print "4" for the input given above.
 
+path can also be a corpusindex.CorpusIndex that is already in memory. the file can be compressed (gzip, bz2 or xz), and '-' reads from stdin:
+
+$ xzcat /home/you/filename.txt.xz | python3 rawcounts.py - 'a'
+
 '''
 
+import corpusindex as ci
+import ldreader as ldr
+
 
 def rawcount(path, seg):
+    if isinstance(path, ci.CorpusIndex):
+        count = path.count(seg)
+        print(count)
+        return count
     count = 0
-    with open(path, 'r', encoding='utf-8') as f:
-        for word in f:
-            segs = word.rstrip('\n').split(' ')
-            for x in segs:
-                if x == seg:
-                    count+=1
+    for segs in ldr.words(path):
+        for x in segs:
+            if x == seg:
+                count+=1
     print(count)
     return count
 
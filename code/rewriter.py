@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+merges clusters into complex segments, all clusters at once, in one left-to-right pass over each word.
+
+the clusters are put in a trie over segments, so every position in a word is checked against all the clusters together, instead of running one substitution per cluster per line. clusters come in priority order (highest inseparability first, as in compseg.merge_clusters), and the result is the same as merging them one at a time in that order:
+    where two matches overlap, the higher-priority cluster wins
+    where a cluster overlaps itself (e.g. 'a a' in 'a a a'), the leftmost match wins
+    where a cluster follows a copy of itself that was just merged, it is left alone: 'c ɕ c ɕ' turns into 'cɕ c ɕ', and 'c ɕ c ɕ c ɕ' into 'cɕ c ɕ cɕ'. the substitution this replaces took the space after a match as part of it, so the next copy had no space in front of it to match
+    a segment made by merging one cluster can be part of a lower-priority cluster: 'n d' and then 'nd ʒ' turn 'n d ʒ' into 'ndʒ'. when that can happen, the clusters are split into stages, and each stage is one pass
+
+>>> import rewriter as rw
+>>> r = rw.ClusterRewriter(['ŋ m', 'm ɡ', 'ɡ b'])
+>>> r.rewrite(['ŋ', 'm', 'ɡ', 'b', 'a'])
+['ŋm', 'ɡb', 'a']
+>>> r.rewrite_line('ŋ m ɡ b a\t12\n')
+'ŋm ɡb a\t12\n'
+'''
+
+import ldreader as ldr
+
+
+class ClusterRewriter:
+    '''
+    clustlist is a list of clusters, highest priority first. each cluster is a space-separated string ('n d') or a tuple of segments, of any length
+    '''
+
+    def __init__(self, clustlist):
+        self.clusters = [tuple(x.split(' ')) if isinstance(x, str) else tuple(x) for x in clustlist]
+        self.stages = []
+        trie = {}
+        made = set()
+        for (priority, clust) in enumerate(self.clusters):
+            #this cluster contains a segment that an earlier cluster in the stage makes, so it has to see that stage's output
+            if made.intersection(clust):
+                self.stages.append(trie)
+                trie = {}
+                made = set()
+            node = trie
+            for seg in clust:
+                node = node.setdefault(seg, {})
+            #None is never a segment, so it marks the end of a cluster
+            if not None in node:
+                node[None] = priority
+            made.add(''.join(clust))
+        if trie:
+            self.stages.append(trie)
+
+    def rewrite(self, word):
+        '''
+        word is a list of segments. returns the merged word (the same list, if nothing changed)
+        '''
+        for trie in self.stages:
+            word = rewrite_word(word, trie)
+        return word
+
+    def rewrite_line(self, line):
+        '''
+        rewrites one line of LearningData.txt. anything after the first tab is left as it is
+        '''
+        (word, tail) = ldr.split_line(line)
+        new = self.rewrite(word)
+        if tail is None:
+            return ' '.join(new)+'\n'
+        return ' '.join(new)+'\t'+tail+'\n'
+
+    def rewrite_file(self, oldpath, newpath):
+        '''
+        rewrites every line of the learning data at oldpath, and writes the result to newpath.
+        returns the number of lines that changed
+        '''
+        changed = 0
+        with ldr.open_ld(newpath, 'w') as out:
+            for (word, tail) in ldr.records(oldpath):
+                new = self.rewrite(word)
+                if new is not word:
+                    changed += 1
+                if tail is None:
+                    out.write(' '.join(new)+'\n')
+                else:
+                    out.write(' '.join(new)+'\t'+tail+'\n')
+        return changed
+
+
+def rewrite_word(word, trie):
+    '''
+    one pass over word with one stage's trie: finds every match, then takes them by priority and then position, skipping any that overlap a match already taken, and any that start right where the last match of the same cluster ended
+    '''
+    n = len(word)
+    matches = []
+    for start in range(n):
+        node = trie.get(word[start])
+        end = start+1
+        while node is not None:
+            if None in node:
+                matches.append((node[None], start, end))
+            if end == n:
+                break
+            node = node.get(word[end])
+            end += 1
+    if not matches:
+        return word
+    matches.sort()
+    taken = [False]*n
+    merged = {}
+    last = (None, None)
+    for (priority, start, end) in matches:
+        if (priority, start) == last:
+            continue
+        if not any(taken[start:end]):
+            taken[start:end] = [True]*(end-start)
+            merged[start] = end
+            last = (priority, end)
+    out = []
+    i = 0
+    while i < n:
+        if i in merged:
+            out.append(''.join(word[i:merged[i]]))
+            i = merged[i]
+        else:
+            out.append(word[i])
+            i += 1
+    return out
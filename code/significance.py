@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+significance tests for cluster counts.
+
+natclasscounter.findPValue asks whether the observed number of a cluster is significantly different from 0, with a Fisher's exact test on the table
+
+    [[count, total-count],
+     [0,     total]]
+
+the two rows have the same sum, so under the hypergeometric distribution the counts 0 and count in the top left cell are the two least likely outcomes, and they are equally likely. the two-sided p-value is therefore just twice the probability of the observed table, which can be computed in log space for many clusters at once.
+
+many clusters share the same (count, total) pair, and the total stays the same within an iteration, so p-values are deduplicated before they are computed and remembered across iterations in a bounded LRU cache.
+
+>>> import significance as sig
+>>> sig.fisher_pvalues([484, 3, 1], 21003).round(3)
+array([0.  , 0.25, 1.  ])
+'''
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.special import gammaln
+
+#how many (count, total) pairs to remember
+CACHESIZE = 200000
+_cache = OrderedDict()
+#fisher_pvalues can be called from several threads at once (learners run from a thread pool), so the cache is locked like the feature cache in pynatclasses
+_cachelock = threading.Lock()
+
+
+def log_hypergeom_pmf(x, popsize, nsuccess, ndraws):
+    '''
+    log of the hypergeometric probability of drawing x successes in ndraws draws from a population of popsize with nsuccess successes.
+    all arguments can be numpy arrays.
+    '''
+    x = np.asarray(x, dtype=float)
+    return (logchoose(nsuccess, x) + logchoose(popsize-nsuccess, ndraws-x) - logchoose(popsize, ndraws))
+
+
+def logchoose(n, k):
+    n = np.asarray(n, dtype=float)
+    k = np.asarray(k, dtype=float)
+    return gammaln(n+1) - gammaln(k+1) - gammaln(n-k+1)
+
+
+def compute_pvalues(counts, totals):
+    '''
+    the two-sided Fisher's exact p-value for [[count, total-count], [0, total]], for arrays of counts and totals. nothing is cached.
+    '''
+    counts = np.asarray(counts, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    pvals = np.ones(counts.shape)
+    #a count of 0 leaves an empty column, and a count of 1 makes both outcomes equally likely: p is 1 either way
+    todo = counts > 1
+    if todo.any():
+        k = counts[todo]
+        n = totals[todo]
+        #P(count) under the hypergeometric distribution: population 2*total, total successes (the top row), count draws (the first column)
+        logp = log_hypergeom_pmf(k, 2*n, n, k)
+        pvals[todo] = np.minimum(1.0, 2*np.exp(logp))
+    return pvals
+
+
+def fisher_pvalues(counts, total):
+    '''
+    counts is a list or array of cluster counts; total is the number of all clusters (a single number, or one per count).
+    returns an array of p-values, the same as calling natclasscounter.findPValue on each count.
+    '''
+    counts = np.asarray(counts, dtype=np.int64)
+    totals = np.broadcast_to(np.asarray(total, dtype=np.int64), counts.shape)
+    if counts.size == 0:
+        return np.zeros(0)
+    pairs, inverse = np.unique(np.stack([counts.ravel(), totals.ravel()], axis=1), axis=0, return_inverse=True)
+    uniqvals = np.empty(len(pairs))
+    missing = []
+    with _cachelock:
+        for (i, pair) in enumerate(map(tuple, pairs.tolist())):
+            val = _cache.get(pair)
+            if val is None:
+                missing.append(i)
+            else:
+                _cache.move_to_end(pair)
+                uniqvals[i] = val
+    if missing:
+        newvals = compute_pvalues(pairs[missing, 0], pairs[missing, 1])
+        uniqvals[missing] = newvals
+        with _cachelock:
+            for (i, val) in zip(missing, newvals.tolist()):
+                _cache[tuple(pairs[i].tolist())] = val
+            while len(_cache) > CACHESIZE:
+                _cache.popitem(last=False)
+    return uniqvals[inverse.ravel()].reshape(counts.shape)
+
+
+def clear_cache():
+    with _cachelock:
+        _cache.clear()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+runs the complex segment learner for a grid of threshold and alpha values, and reports the final inventory for each setting.
+
+running complexify once per setting repeats a lot of work: the first iteration's counts and inseparability values are the same for every setting, and settings that merge the same clusters end up in the same place. here, every state of the learner (the data and the features after some sequence of merges) is computed once, and is keyed by the merges that led to it, so settings that pick the same clusters share everything downstream.
+
+nothing is written to disk except the summary table.
+
+usage:
+
+$ python3 sweep.py --language=ngbaka --thresholds=0.5,1,1.5,2 --alphas=0.01,0.05
+
+or, from python:
+
+>>> import sweep
+>>> rows = sweep.sweep('/home/you/LearningData.txt', '/home/you/Features.txt', [0.5, 1, 2], [0.01, 0.05])
+>>> sweep.write_table(rows, '/home/you/sweep.txt')
+'''
+
+import os
+import contextlib
+
+import compseg
+import corpusindex as ci
+import natclasscounter as nc
+import ngramcounter as ngc
+import pynatclasses as pnc
+import messages as msg
+
+
+class SweepState:
+    '''
+    one state of the learner: the feature table and the data (an ngramcounter.RunningCounts) after the merges in history.
+    history is a tuple with one frozenset of merged clusters per iteration; it is the key states are remembered by.
+    the inseparability table is computed the first time it is asked for.
+    '''
+
+    def __init__(self, history, featlines, counts):
+        self.history = history
+        self.featlines = featlines
+        self.counts = counts
+        self.table = None
+
+
+def sweep(ld, feats, thresholds, alphas, **kwargs):
+    '''
+    ld and feats are paths to LearningData.txt and Features.txt (ld can also be a compiled corpus or a corpusindex.CorpusIndex)
+    thresholds and alphas are lists of numbers; every combination is run.
+    returns a list of dictionaries, one per setting: threshold, alpha, iterations, segments (the complex segments added to the inventory), inventory (all the segments in the final feature file)
+    '''
+    oldfeats = pnc.read_feat_file(feats)
+    mint = min(thresholds)
+    states = {(): SweepState((), oldfeats, ngc.RunningCounts.from_corpus(ld))}
+    oldsegs = [line[0] for line in oldfeats[1]]
+    rows = []
+    #the learner prints as it goes; a sweep would print it all once per state
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for threshold in thresholds:
+            for alpha in alphas:
+                state = states[()]
+                while True:
+                    clusters = pick_clusters(state, threshold, alpha, mint, **kwargs)
+                    if not clusters:
+                        break
+                    key = state.history + (frozenset(clusters),)
+                    if not key in states:
+                        states[key] = next_state(state, key, clusters, oldfeats, threshold=threshold, **kwargs)
+                    state = states[key]
+                segs = [line[0] for line in state.featlines[1]]
+                rows.append({'threshold': threshold, 'alpha': alpha, 'iterations': len(state.history), 'segments': [x for x in segs if not x in oldsegs], 'inventory': segs})
+    msg.env_render(message=f'\n{len(thresholds)*len(alphas)} settings, {len(states)} distinct learner states', **kwargs)
+    return rows
+
+
+def pick_clusters(state, threshold, alpha, mint, **kwargs):
+    '''
+    the clusters complexify would merge in this state, with this threshold and alpha.
+    the inseparability table is computed once per state, with p-values for every cluster that can pass the lowest threshold in the sweep
+    '''
+    if state.table is None:
+        kwargs['threshold'] = mint
+        kwargs['pvalues'] = 'none'
+        state.table = nc.bidir_prob_wrapper(state.featlines, state.counts, **kwargs)
+    tpd, countd = state.table
+    clusters = {k: v for (k, v) in tpd.items() if v >= threshold}
+    #same test as complexify, on the same rounded p-value
+    return {k: v for (k, v) in clusters.items() if not float(countd[k].split('\t')[5]) > alpha}
+
+
+def next_state(state, key, clusters, oldfeats, **kwargs):
+    '''
+    what complexify does at the end of an iteration: new features for the merged clusters, and the merged data. the state passed in is not changed.
+    threshold in kwargs must be the one the clusters were picked with, or clusters below 1 are left out
+    '''
+    newfeats = compseg.make_new_feats(state.featlines, compseg.get_new_segs(state.featlines, clusters, **kwargs))
+    counts = state.counts.copy()
+    compseg.merge_clusters(clusters, counts, **kwargs)
+    return SweepState(key, compseg.feats_w_check(counts, oldfeats, newfeats, **kwargs), counts)
+
+
+def write_table(rows, outpath):
+    '''
+    writes one tab-separated line per setting: threshold, alpha, number of iterations with merges, complex segments found, final inventory
+    '''
+    with open(outpath, 'w', encoding='utf-8') as f:
+        f.write('\t'.join(['threshold', 'alpha', 'iterations', 'complex_segments', 'inventory'])+'\n')
+        for row in rows:
+            f.write('\t'.join([str(row['threshold']), str(row['alpha']), str(row['iterations']), ', '.join(row['segments']) or 'none', ' '.join(row['inventory'])])+'\n')
+
+
+if __name__=='__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='runs the complex segment learner for every combination of the thresholds and alphas given, and writes a table of the final inventory for each.')
+    parser.add_argument('--ld', help="full path to learning data file")
+    parser.add_argument('--feats', help="full path to feature file")
+    parser.add_argument('--language', help='a folder inside "data", as in compseg.py')
+    parser.add_argument('--thresholds', help='comma-separated inseparability thresholds', default='1.0')
+    parser.add_argument('--alphas', help="comma-separated alpha values for Fisher's Exact Test", default='0.05')
+    parser.add_argument('--vowels', help='makes the learner count vocoids rather than consonants', type=bool, default=False)
+    parser.add_argument('--out', help='where to write the table (default: sweep.txt next to the learning data)')
+    args = parser.parse_args()
+    if args.language:
+        lgpath = os.path.join(os.path.dirname(os.getcwd()), 'data', args.language)
+        args.ld = ci.prefer_compiled(os.path.join(lgpath, 'LearningData.txt'))
+        args.feats = os.path.join(lgpath, 'Features.txt')
+    thresholds = [float(x) for x in args.thresholds.split(',')]
+    alphas = [float(x) for x in args.alphas.split(',')]
+    rows = sweep(args.ld, args.feats, thresholds, alphas, vowels=args.vowels)
+    outpath = args.out or os.path.join(os.path.dirname(os.path.normpath(args.ld)), 'sweep.txt')
+    write_table(rows, outpath)
+    msg.env_render(message=f'\nWrote {outpath}\n')
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+tier projections of a corpus: every word with everything except the segments of one projection taken out, as in "p a t e k i" -> "a e i" on a vowel tier.
+
+a projection is defined by a list of segments, or by features that pick out a natural class in Features.txt. a tier is kept as a corpusindex.CorpusIndex of its own: the same words in the same order (so word i of the tier is word i of the corpus, projected) and the same segment IDs, but only the tokens on the projection.
+
+a tier is made once per corpus and projection and remembered in memory, keyed by the corpus file's path, modification time and size (see corpusindex.source_key), so asking for it again does not even read the corpus. nothing is written to disk unless a cachedir is given: then the tier is also saved there in the compiled corpus format (see corpusindex), and later runs read it back instead of making it again. tier_dir(corpus) is the usual place, a tiers/ directory next to the learning data. the saved copy is named after a digest of the corpus contents and of the projection's segments, so a changed corpus, or a feature file that now picks out different segments, gets a new tier instead of a stale one.
+
+the nonlocal counters in oecalc (OEcalc with local=False, trigramOEcalc and oe_distances with a projection) read their tiers from here.
+
+usage:
+
+>>> import tiers as tr
+>>> vowels = tr.Projection.from_feats('+syll', '/home/you/Features.txt')
+>>> tier = tr.tier('/home/you/LearningData.txt', vowels)
+>>> tier.word(0)
+['a', 'e', 'i']
+
+saved next to the learning data, for later runs:
+
+>>> import corpusindex as ci
+>>> corpus = ci.load('/home/you/LearningData.txt')
+>>> tier = tr.tier(corpus, vowels, cachedir=tr.tier_dir(corpus))
+
+several at once:
+
+>>> tr.tiers('/home/you/LearningData.txt', [vowels, tr.Projection.from_segs('p t k')])
+{'+syll': <corpusindex.CorpusIndex ...>, 'p t k': <corpusindex.CorpusIndex ...>}
+'''
+
+import os
+import hashlib
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+import corpusindex as ci
+import pynatclasses as pnc
+
+#how many tiers to keep in memory
+TIERCACHESIZE = 32
+_tiercache = OrderedDict()
+
+
+class Projection:
+    '''
+    the segments that are visible on a tier.
+    name: how the projection was asked for, e.g. '+syll' or 'p t k'
+    segs: the segments, in the order given (or, for features, in Features.txt order)
+    '''
+
+    def __init__(self, segs, name=None):
+        self.segs = list(dict.fromkeys(segs.strip().split(' ') if isinstance(segs, str) else segs))
+        self.name = name if name is not None else ' '.join(self.segs)
+
+    @classmethod
+    def from_segs(cls, segs):
+        '''
+        segs is a list of segments or a space-separated string, 'p t k'
+        '''
+        return cls(segs)
+
+    @classmethod
+    def from_feats(cls, feats, featfilepath):
+        '''
+        feats is a list of feature values, or a comma-separated string like '-son,-cont'. the projection is every segment in Features.txt (or a feature table, see pynatclasses.load_feats) that has all of them
+        '''
+        if isinstance(feats, str):
+            feats = [x.strip() for x in feats.split(',')]
+        return cls(pnc.load_table(featfilepath).segs_with(feats), name=','.join(feats))
+
+    def key(self):
+        '''
+        a digest of the segments on the projection, whatever their order and however the projection was defined
+        '''
+        return hashlib.sha1('\n'.join(sorted(self.segs)).encode('utf-8')).hexdigest()
+
+
+def projection(proj):
+    '''
+    proj is a Projection, or a list of segments or a space-separated string to make one from
+    '''
+    if isinstance(proj, Projection):
+        return proj
+    return Projection.from_segs(proj)
+
+
+def project(corpus, segs):
+    '''
+    makes the tier of a corpusindex.CorpusIndex for a list of segments, without looking in any cache
+    '''
+    keep = corpus.lookup(segs)[corpus.tokens] >= 0
+    wordids = np.repeat(np.arange(len(corpus)), np.diff(corpus.offsets))[keep]
+    offsets = np.zeros(len(corpus)+1, dtype=np.int64)
+    np.cumsum(np.bincount(wordids, minlength=len(corpus)), out=offsets[1:])
+    return ci.CorpusIndex(corpus.symbols, corpus.tokens[keep], offsets)
+
+
+def tier_dir(corpus):
+    '''
+    where the tiers of a corpus are usually saved, when tier is given a cachedir: tiers/ next to its learning data (or next to its compiled directory). None for a corpus that did not come from a file
+    '''
+    if not isinstance(corpus.path, str) or corpus.path == '-':
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(os.path.normpath(corpus.path))), 'tiers')
+
+
+def tier(datapath, proj, cachedir=None):
+    '''
+    the tier of datapath (a path to LearningData.txt, a compiled corpus or a corpusindex.CorpusIndex) for the projection proj, as a CorpusIndex.
+    it is taken from memory if it has been made before, without reading the corpus. otherwise it is made, and kept in memory only, unless cachedir is given (e.g. tier_dir(corpus)): then it is read from cachedir if it was saved there before, and saved there if not. if cachedir cannot be written to, the tier is only kept in memory
+    '''
+    proj = projection(proj)
+    source = ci.source_key(datapath)
+    key = None if source is None else (source, proj.key())
+    if key is not None and key in _tiercache:
+        _tiercache.move_to_end(key)
+        return _tiercache[key][1]
+    corpus = ci.load(datapath)
+    if cachedir is None:
+        result = project(corpus, proj.segs)
+    else:
+        path = os.path.join(cachedir, corpus.digest()[:16]+'-'+proj.key()[:16])
+        if ci.is_compiled(path):
+            result = ci.load_compiled(path)
+        else:
+            result = project(corpus, proj.segs)
+            save_tier(result, proj, path)
+    if key is not None:
+        #the corpus is kept with the tier, so that its id is not reused while the entry is cached
+        _tiercache[key] = (corpus, result)
+        while len(_tiercache) > TIERCACHESIZE:
+            _tiercache.popitem(last=False)
+    return result
+
+
+def save_tier(tiercorpus, proj, path):
+    '''
+    writes the tier in the compiled corpus format, with a projection.txt listing its segments. the tier is written next to path and then moved into place, so two processes making the same tier do not read each other's half-written files
+    returns True if the tier is saved at path. if it cannot be written (a read-only data directory, a file called tiers, ...), nothing is left behind and False is returned: the tier still works, it is just not saved
+    '''
+    tmppath = path+'.tmp'+str(os.getpid())
+    try:
+        ci.compile_corpus(tiercorpus, tmppath)
+        with open(os.path.join(tmppath, 'projection.txt'), 'w', encoding='utf-8') as f:
+            f.write(proj.name+'\n')
+            for seg in proj.segs:
+                f.write(seg+'\n')
+    except OSError:
+        shutil.rmtree(tmppath, ignore_errors=True)
+        return False
+    try:
+        os.rename(tmppath, path)
+    except OSError:
+        #someone else saved it first, or the directory cannot be written to
+        shutil.rmtree(tmppath, ignore_errors=True)
+    return ci.is_compiled(path)
+
+
+def tiers(datapath, projections, cachedir=None):
+    '''
+    the tiers for a list of projections (Projection objects, segment lists or space-separated strings), as {projection name: CorpusIndex}. the corpus is read once
+    '''
+    corpus = ci.load(datapath)
+    outdic = {}
+    for proj in projections:
+        proj = projection(proj)
+        outdic[proj.name] = tier(corpus, proj, cachedir)
+    return outdic
+
+
+def clear_cache():
+    '''
+    forgets the tiers kept in memory (the saved ones stay on disk)
+    '''
+    _tiercache.clear()
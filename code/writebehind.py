@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+writes the files that complexify produces for each iteration (LearningData.txt, Features.txt, inseparability.txt).
+
+complexify keeps its data and features in memory between iterations, so these files are only a record of the simulation. the writer decides when they get written:
+
+    'sync': right away, before the learner moves on (the default, and what complexify has always done)
+    'thread': in a background thread, while the learner goes on to the next iteration
+    'end': held until the learner is done, then written all at once
+    None: not at all
+
+every job is a function plus its arguments; the arguments must not change after the job is handed over.
+'''
+
+import os
+import queue
+import threading
+
+
+class IterationWriter:
+    '''
+    mode is 'sync', 'thread', 'end' or None (see module docstring).
+    call write(path, func, *args) for each file, and close() when the learner is done; close() waits for the writes to finish and re-raises the first error, if there was one.
+    '''
+
+    def __init__(self, mode='sync'):
+        if not mode in ['sync', 'thread', 'end', None]:
+            raise ValueError(f"artifacts must be 'sync', 'thread', 'end' or None, not {mode}")
+        self.mode = mode
+        self.pending = []
+        self.error = None
+        if mode == 'thread':
+            self.jobs = queue.Queue()
+            self.thread = threading.Thread(target=self._work, daemon=True)
+            self.thread.start()
+
+    def write(self, path, func, *args):
+        '''
+        func(path, *args) writes the file at path. its directory is created if it does not exist yet.
+        '''
+        if self.mode == 'sync':
+            run_job(path, func, args)
+        elif self.mode == 'thread':
+            self.jobs.put((path, func, args))
+        elif self.mode == 'end':
+            self.pending.append((path, func, args))
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                run_job(*job)
+            except Exception as e:
+                if self.error is None:
+                    self.error = e
+
+    def close(self):
+        if self.mode == 'thread':
+            self.jobs.put(None)
+            self.thread.join()
+        elif self.mode == 'end':
+            for job in self.pending:
+                run_job(*job)
+            self.pending = []
+        if self.error is not None:
+            raise self.error
+
+
+def run_job(path, func, args):
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    func(path, *args)
@@ -0,0 +1,32 @@
+# coding: utf-8
+
+'''
+the modules in code/ import each other by their short names (import corpusindex as ci), so the tests need code/ on the path, the way it is when a script is run from there
+'''
+
+import filecmp
+import os
+import sys
+
+CODEDIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'code')
+DATADIR = os.path.join(os.path.dirname(CODEDIR), 'data')
+#simulation directories written by the learner before the corpus index, rewriter and write-behind (complexify with threshold=1.0, alpha=0.05)
+BASELINEDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline')
+
+if CODEDIR not in sys.path:
+    sys.path.insert(0, CODEDIR)
+
+
+def baseline_differences(lang, simdir):
+    '''
+    the files in baseline/lang that are missing from simdir or differ from the ones there
+    '''
+    expected = os.path.join(BASELINEDIR, lang)
+    differ = []
+    for (path, dirs, files) in os.walk(expected):
+        for fname in files:
+            rel = os.path.relpath(os.path.join(path, fname), expected)
+            new = os.path.join(simdir, rel)
+            if not os.path.isfile(new) or not filecmp.cmp(os.path.join(expected, rel), new, shallow=False):
+                differ.append(rel)
+    return sorted(differ)
@@ -0,0 +1,64 @@
+# coding: utf-8
+
+'''
+a batch run writes what running compseg on each language writes, and a broken language does not stop the others
+'''
+
+import os
+import shutil
+
+import batch
+import pynatclasses as pnc
+
+from conftest import DATADIR, BASELINEDIR, baseline_differences
+
+
+def make_data(root):
+    datadir = os.path.join(str(root), 'data')
+    yidiny = os.path.join(datadir, 'yidiny')
+    os.makedirs(yidiny)
+    for fname in ('LearningData.txt', 'Features.txt'):
+        shutil.copy(os.path.join(DATADIR, 'yidiny', fname), yidiny)
+    #no syll feature, so the learner cannot find the consonants
+    broken = os.path.join(datadir, 'broken', 'words')
+    os.makedirs(broken)
+    with open(os.path.join(broken, 'LearningData.txt'), 'w', encoding='utf-8') as f:
+        f.write('p a t a\nt a k a\n')
+    with open(os.path.join(broken, 'Features.txt'), 'w', encoding='utf-8') as f:
+        f.write('\tcons\tvoice\np\t+\t-\nt\t+\t-\nk\t+\t-\na\t-\t+\n')
+    return datadir
+
+
+def test_discover_skips_simulations(tmp_path):
+    datadir = make_data(tmp_path)
+    os.makedirs(os.path.join(datadir, 'yidiny', 'simulation', 'iteration1'))
+    for fname in ('LearningData.txt', 'Features.txt'):
+        shutil.copy(os.path.join(datadir, 'yidiny', fname), os.path.join(datadir, 'yidiny', 'simulation', 'iteration1'))
+    assert sorted(batch.discover(datadir)) == ['broken/words', 'yidiny']
+
+
+def test_batch(tmp_path, capsys):
+    datadir = make_data(tmp_path)
+    results = batch.run_batch(batch.discover(datadir), workers=2)
+    assert [x['language'] for x in results] == ['broken/words', 'yidiny']
+    (broken, yidiny) = results
+    assert broken['status'] == 'failed'
+    assert yidiny['status'] == 'ok'
+    assert baseline_differences('yidiny', os.path.join(datadir, 'yidiny', 'simulation')) == []
+    oldsegs = [line[0] for line in pnc.read_feat_file(os.path.join(DATADIR, 'yidiny', 'Features.txt'))[1]]
+    finalsegs = [line[0] for line in pnc.read_feat_file(os.path.join(BASELINEDIR, 'yidiny', 'iteration2', 'Features.txt'))[1]]
+    assert yidiny['segments'] == [x for x in finalsegs if not x in oldsegs]
+    outpath = os.path.join(str(tmp_path), 'summary.txt')
+    batch.write_summary(results, outpath)
+    with open(outpath, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3
+    assert lines[2].startswith('yidiny\t'+', '.join(yidiny['segments'])+'\t')
+
+
+def test_manifest(tmp_path):
+    datadir = make_data(tmp_path)
+    manifest = os.path.join(str(tmp_path), 'manifest.txt')
+    with open(manifest, 'w', encoding='utf-8') as f:
+        f.write('# just one\nyidiny\n\n')
+    assert batch.read_manifest(manifest, datadir) == {'yidiny': os.path.join(datadir, 'yidiny')}
@@ -0,0 +1,43 @@
+# coding: utf-8
+
+'''
+the learner's output against output saved from the code before the corpus index, rewriter and write-behind (see baseline/)
+'''
+
+import filecmp
+import os
+import shutil
+
+import pytest
+
+import compseg
+
+from conftest import DATADIR, BASELINEDIR, baseline_differences
+
+
+def run(lang, outdir, **kwargs):
+    for fname in ('LearningData.txt', 'Features.txt'):
+        shutil.copy(os.path.join(DATADIR, lang, fname), str(outdir))
+    out = compseg.complexify(ld=os.path.join(str(outdir), 'LearningData.txt'), feats=os.path.join(str(outdir), 'Features.txt'), outdir=str(outdir), threshold=1.0, alpha=0.05, **kwargs)
+    return (os.path.join(str(outdir), 'simulation'), out)
+
+
+@pytest.mark.parametrize('artifacts', ['sync', 'thread', 'end'])
+def test_yidiny(tmp_path, artifacts):
+    #some yidiny lines end in a space, which the iteration files used to keep
+    (simdir, _) = run('yidiny', tmp_path, artifacts=artifacts)
+    assert baseline_differences('yidiny', simdir) == []
+    assert not os.path.exists(os.path.join(simdir, 'iteration3', 'LearningData.txt'))
+
+
+def test_inmemory_leaves_simulation_alone(tmp_path):
+    os.mkdir(str(tmp_path/'simulation'))
+    with open(str(tmp_path/'simulation'/'earlier.txt'), 'w') as f:
+        f.write('from an earlier run\n')
+    (simdir, (featlines, corpus)) = run('yidiny', tmp_path, inmemory=True)
+    assert os.listdir(simdir) == ['earlier.txt']
+    assert os.path.isfile(str(tmp_path/'simulation_report.txt'))
+    compseg.write_new_feats(str(tmp_path/'Features.final.txt'), featlines)
+    assert filecmp.cmp(str(tmp_path/'Features.final.txt'), os.path.join(BASELINEDIR, 'yidiny', 'iteration2', 'Features.txt'), shallow=False)
+    corpus.write(str(tmp_path/'LearningData.final.txt'))
+    assert filecmp.cmp(str(tmp_path/'LearningData.final.txt'), os.path.join(BASELINEDIR, 'yidiny', 'iteration2', 'LearningData.txt'), shallow=False)
@@ -0,0 +1,69 @@
+# coding: utf-8
+
+'''
+the corpus index against reading the file line by line, the way the counters did before it
+'''
+
+import os
+from collections import Counter
+
+import pytest
+
+import corpusindex as ci
+
+from conftest import DATADIR
+
+
+def baseline_words(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip().split(' ') for line in f]
+
+
+def baseline_ngrams(words, gramsize):
+    return Counter(' '.join(word[i:i+gramsize]) for word in words for i in range(len(word)-gramsize+1))
+
+
+@pytest.fixture(params=['yidiny', 'mbay', 'shona'])
+def path(request):
+    return os.path.join(DATADIR, request.param, 'LearningData.txt')
+
+
+def test_words(path):
+    corpus = ci.load(path)
+    old = baseline_words(path)
+    assert list(corpus.words()) == old
+    assert len(corpus) == len(old)
+    assert corpus.tails is None
+
+
+def test_counts(path):
+    corpus = ci.load(path)
+    old = baseline_words(path)
+    unigrams = Counter(seg for word in old for seg in word)
+    assert corpus.unigram_counts(list(unigrams)+['not a segment']) == dict(unigrams, **{'not a segment': 0})
+    assert corpus.segments() == list(unigrams)
+    for gramsize in (2, 3):
+        assert corpus.ngram_counts(gramsize) == baseline_ngrams(old, gramsize)
+
+
+def test_compiled(path, tmp_path):
+    corpus = ci.load(path)
+    outdir = ci.compile_corpus(corpus, str(tmp_path/'LearningData.corpus'))
+    compiled = ci.load(outdir)
+    assert compiled.symbols == corpus.symbols
+    assert list(compiled.words()) == list(corpus.words())
+    assert compiled.digest() == corpus.digest()
+    assert compiled.source == ci.source_key(outdir)
+    assert corpus.source == ci.source_key(path)
+
+
+def test_tails(tmp_path):
+    path = str(tmp_path/'LearningData.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('p a t a\t12\nt a k a \t\ns a  p i\n')
+    corpus = ci.load(path)
+    assert list(corpus.words()) == [['p', 'a', 't', 'a'], ['t', 'a', 'k', 'a'], ['s', 'a', '', 'p', 'i']]
+    assert corpus.tails == ['12', '', None]
+    compiled = ci.load(ci.compile_corpus(corpus, str(tmp_path/'LearningData.corpus')))
+    assert compiled.tails == corpus.tails
+    assert list(compiled.words()) == list(corpus.words())
@@ -0,0 +1,41 @@
+# coding: utf-8
+
+'''
+ldreader has to split lines the way the learner always has: strip the word, then split it on single spaces
+'''
+
+import gzip
+import os
+
+import ldreader as ldr
+
+from conftest import DATADIR
+
+
+def test_trailing_spaces():
+    assert ldr.split_line('m b a  \n') == (['m', 'b', 'a'], None)
+    assert ldr.split_line(' m b a\r\n') == (['m', 'b', 'a'], None)
+
+
+def test_double_space_inside_a_word():
+    assert ldr.split_line('m  b a\n') == (['m', '', 'b', 'a'], None)
+
+
+def test_tab_tail_kept_as_it_is():
+    assert ldr.split_line('m b a \t12 x\n') == (['m', 'b', 'a'], '12 x')
+
+
+def test_records_from_gzip(tmp_path):
+    path = str(tmp_path/'LearningData.txt.gz')
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write('p a t a \nt a k a\t3\n')
+    assert list(ldr.records(path)) == [(['p', 'a', 't', 'a'], None), (['t', 'a', 'k', 'a'], '3')]
+
+
+def test_same_words_as_strip_and_split():
+    #yidiny has lines that end in a space, shona has lines that end in two
+    for lang in ('yidiny', 'shona'):
+        path = os.path.join(DATADIR, lang, 'LearningData.txt')
+        with open(path, encoding='utf-8') as f:
+            old = [line.strip().split(' ') for line in f]
+        assert list(ldr.words(path)) == old
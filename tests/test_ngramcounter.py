@@ -0,0 +1,94 @@
+# coding: utf-8
+
+'''
+the counters against the counting loops in natclasscounter that they replaced, and RunningCounts.merge against rewriting the file with the old substitution and counting it again
+'''
+
+import os
+from collections import Counter
+
+import pytest
+
+import ngramcounter as ngc
+import pynatclasses as pnc
+
+from conftest import DATADIR
+from test_rewriter import baseline_merge
+
+
+def lang_files(lang):
+    return (os.path.join(DATADIR, lang, 'LearningData.txt'), os.path.join(DATADIR, lang, 'Features.txt'))
+
+
+def baseline_count_clusters(clustlist, datapath, gramsize):
+    clustercount = {}.fromkeys(clustlist, 0)
+    with open(datapath, 'r', encoding='utf-8') as f:
+        for line in f:
+            grams = line.strip().split(' ')
+            for x in (' '.join(grams[i:i+gramsize]) for i in range(len(grams)-gramsize+1)):
+                if x in clustercount:
+                    clustercount[x] += 1
+    return clustercount
+
+
+def baseline_uni_counts(conslist, datapath):
+    unigramcount = {}.fromkeys(conslist, 0)
+    with open(datapath, 'r', encoding='utf-8') as f:
+        for word in f:
+            for x in word.strip().split(' '):
+                if x in unigramcount:
+                    unigramcount[x] += 1
+    return unigramcount
+
+
+@pytest.mark.parametrize('lang', ['yidiny', 'mbay'])
+def test_count_matrix(lang):
+    (ld, feats) = lang_files(lang)
+    cons = pnc.get_consonants(feats)
+    counts = ngc.count_matrix(cons, ld)
+    clusters = [x+' '+y for x in cons for y in cons]
+    assert counts.as_dict() == baseline_count_clusters(clusters, ld, 2)
+    assert counts.unigram_dict() == baseline_uni_counts(cons, ld)
+    assert counts.total() == sum(baseline_count_clusters(clusters, ld, 2).values())
+
+
+def test_count_trigrams():
+    (ld, feats) = lang_files('mbay')
+    segs = pnc.get_consonants(feats)[:12]+pnc.get_vowels(feats)[:4]
+    trigrams = [' '.join((x, y, z)) for x in segs for y in segs for z in segs]
+    old = {k: v for (k, v) in baseline_count_clusters(trigrams, ld, 3).items() if v}
+    new = ngc.count_ngrams(segs, ld, 3)
+    assert new.as_dict() == old
+    #the rows come in the order the old dictionary had its keys
+    assert new.names() == list(old)
+
+
+def test_merge():
+    (ld, feats) = lang_files('mbay')
+    cons = pnc.get_consonants(feats)
+    running = ngc.RunningCounts.from_corpus(ld)
+    top = sorted((n, pair) for (pair, n) in running.bigrams.items() if pair[0] in cons and pair[1] in cons)[::-1][:6]
+    clustlist = [' '.join(pair) for (n, pair) in top]
+    #a cluster with a segment that the first one makes
+    clustlist.append(''.join(top[0][1])+' a')
+    before = running.copy()
+    assert running.merge(clustlist) > 0
+    with open(ld, 'r', encoding='utf-8') as f:
+        lines = [baseline_merge(clustlist, line) for line in f]
+    words = [line.split(' ') for line in lines]
+    assert running.words == words
+    assert running.unigrams == Counter(seg for word in words for seg in word)
+    assert running.bigrams == Counter(pair for word in words for pair in zip(word, word[1:]))
+    #the copy made before the merge did not change
+    assert before.words == ngc.RunningCounts.from_corpus(ld).words
+    assert before.bigrams == ngc.RunningCounts.from_corpus(ld).bigrams
+
+
+def test_write_words(tmp_path):
+    (ld, feats) = lang_files('yidiny')
+    running = ngc.RunningCounts.from_corpus(ld)
+    running.write(str(tmp_path/'LearningData.txt'))
+    with open(ld, 'r', encoding='utf-8') as f:
+        old = ''.join(line.strip()+'\n' for line in f)
+    with open(str(tmp_path/'LearningData.txt'), 'r', encoding='utf-8') as f:
+        assert f.read() == old
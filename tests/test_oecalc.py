@@ -0,0 +1,79 @@
+# coding: utf-8
+
+'''
+OEcalc against the loops it replaced, on learning data with trailing and doubled spaces
+'''
+
+import os
+from itertools import product
+
+import pytest
+
+import oecalc as oe
+
+from conftest import DATADIR
+
+LD = 'm b a  \nb a m b a \nm  b a\n m a b\na m a \n'
+
+
+def baseline_oecalc(filepath, segs, local):
+    '''
+    OEcalc as it was before the corpus index, counting the pairs word by word
+    '''
+    with open(filepath, 'r', encoding='utf-8') as f:
+        words = f.readlines()
+    seglist = segs.strip().split(' ')
+    wordlist = [x.strip().split(' ') for x in words]
+    pairs = {}.fromkeys(' '.join(list(x)) for x in product(seglist, repeat=2))
+    counts = {}
+    for seg in seglist:
+        counts[seg+'1'] = 0
+        counts[seg+'2'] = 0
+    for x in pairs:
+        pairs[x] = {'observed': 0, 'expected': 0}
+    paircount = 0
+    for word in wordlist:
+        wrd = word if local else [x for x in word if x in seglist]
+        if len(wrd) < 2:
+            continue
+        segpairsinword = [wrd[x]+' '+wrd[x+1] for x in range(0, len(wrd)-1)]
+        paircount += len(segpairsinword)
+        for pair in segpairsinword:
+            if pair in pairs:
+                pairs[pair]['observed'] += 1
+                counts[pair.split(' ')[0]+'1'] += 1
+                counts[pair.split(' ')[1]+'2'] += 1
+    for pair in pairs:
+        (seg1, seg2) = pair.split(' ')
+        pairs[pair]['expected'] = counts[seg1+'1']*counts[seg2+'2']/paircount
+        try:
+            pairs[pair]['OE'] = pairs[pair]['observed']/pairs[pair]['expected']
+            pairs[pair]['OErnd'] = round(pairs[pair]['OE'], 3)
+        except ZeroDivisionError:
+            pairs[pair]['OE'] = 'NA'
+            pairs[pair]['OErnd'] = 'NA'
+    return pairs
+
+
+def same_pairs(new, old):
+    assert list(new) == list(old)
+    for pair in old:
+        assert new[pair]['observed'] == old[pair]['observed']
+        assert new[pair]['expected'] == pytest.approx(old[pair]['expected'])
+        assert new[pair]['OErnd'] == old[pair]['OErnd']
+
+
+@pytest.mark.parametrize('local', [True, False])
+def test_trailing_spaces(tmp_path, local):
+    path = str(tmp_path/'LearningData.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(LD)
+    same_pairs(oe.OEcalc(filepath=path, segs='m b a', local=local), baseline_oecalc(path, 'm b a', local))
+
+
+@pytest.mark.parametrize('lang', ['shona', 'yidiny'])
+def test_every_segment(lang):
+    #shona lines end in two spaces, and some yidiny lines in one
+    path = os.path.join(DATADIR, lang, 'LearningData.txt')
+    segs = ' '.join(sorted(oe.ci.load(path).segments()))
+    same_pairs(oe.OEcalc(filepath=path, segs=segs, local=True), baseline_oecalc(path, segs, True))
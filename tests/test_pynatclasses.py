@@ -0,0 +1,72 @@
+# coding: utf-8
+
+'''
+feature tables and natural classes. closed_classes is checked against trying every combination of feature values
+'''
+
+import os
+import random
+from itertools import combinations
+
+import pytest
+
+import pynatclasses as pnc
+
+from conftest import DATADIR
+
+NOSYLL = (['cons', 'voice'], [['p', '+', '-'], ['b', '+', '+'], ['a', '-', '+']])
+
+
+@pytest.mark.parametrize('getter', [pnc.get_consonants, pnc.get_vowels])
+def test_missing_syll_in_memory(getter, capsys):
+    assert getter(NOSYLL) is None
+    assert getter(pnc.load_table(NOSYLL)) is None
+    out = capsys.readouterr().out
+    assert out.count('The feature file in memory does not have a column for') == 2
+
+
+def test_missing_cons_from_a_file(tmp_path, capsys):
+    path = tmp_path/'simulation'/'iteration1'/'Features.txt'
+    path.parent.mkdir(parents=True)
+    path.write_text('\tsyll\tvoice\np\t-\t-\na\t+\t+\n', encoding='utf-8')
+    assert pnc.get_vocoids(str(path)) is None
+    assert 'The feature file /iteration1/Features.txt does not have a column for -cons' in capsys.readouterr().out
+
+
+def brute_force_classes(featnames, seglines):
+    '''
+    every set of segments that some combination of feature values picks out, with the combination of all the values its segments share
+    '''
+    specs = {line[0]: {line[k+1]+feat for (k, feat) in enumerate(featnames) if line[k+1] in '+-'} for line in seglines}
+    values = sorted(set().union(*specs.values()))
+    classes = {}
+    for size in range(1, len(values)+1):
+        for combo in combinations(values, size):
+            extent = frozenset(seg for seg in specs if specs[seg].issuperset(combo))
+            if extent:
+                classes[extent] = sorted(set.intersection(*(specs[seg] for seg in extent)))
+    return classes
+
+
+def test_closed_classes_random_tables():
+    rng = random.Random(7)
+    for _ in range(200):
+        featnames = ['f%d' % k for k in range(rng.randint(1, 4))]
+        seglines = [['s%d' % i]+[rng.choice('+-0') for f in featnames] for i in range(rng.randint(1, 7))]
+        table = pnc.load_table((featnames, seglines))
+        segs = list(table.segindex)
+        found = {frozenset(seg for (k, seg) in enumerate(segs) if extent >> k & 1): sorted(intent) for (extent, intent) in pnc.closed_classes(table).items()}
+        assert found == brute_force_classes(featnames, seglines), (featnames, seglines)
+
+
+def test_nat_classes_yidiny():
+    table = pnc.load_table(os.path.join(DATADIR, 'yidiny', 'Features.txt'))
+    classes = pnc.get_nat_classes(table)
+    extents = {frozenset(segs) for segs in classes.values()}
+    assert len(extents) == len(classes)
+    for (name, segs) in classes.items():
+        assert table.segs_with(name.split(',')) == segs
+    values = list(table.seg_masks())
+    for (x, y) in combinations(values, 2):
+        segs = table.segs_with([x, y])
+        assert not segs or frozenset(segs) in extents
@@ -0,0 +1,49 @@
+# coding: utf-8
+
+'''
+ClusterRewriter against the one-substitution-per-cluster merge it replaced (compseg.write_new_ld_file before the rewriter)
+'''
+
+import random
+import re
+
+import rewriter as rw
+
+
+def baseline_merge(clustlist, line):
+    word = line.strip()
+    for clust in clustlist:
+        x = r'(^|\s)'+clust+r'(\s|$)'
+        y = r'\1'+''.join(clust.split(' '))+r'\2'
+        word = re.sub(x, y, word)
+    return word
+
+
+def test_back_to_back_copies():
+    r = rw.ClusterRewriter(['c ɕ'])
+    assert r.rewrite_line('c ɕ c ɕ\n') == 'cɕ c ɕ\n'
+    assert r.rewrite_line('c ɕ c ɕ c ɕ\n') == 'cɕ c ɕ cɕ\n'
+    assert r.rewrite_line('c ɕ a c ɕ\n') == 'cɕ a cɕ\n'
+    assert rw.ClusterRewriter(['w a']).rewrite(['w', 'a', 'w', 'a', 'n']) == ['wa', 'w', 'a', 'n']
+
+
+def test_back_to_back_different_clusters():
+    assert rw.ClusterRewriter(['c ɕ', 'w a']).rewrite_line('c ɕ w a\n') == 'cɕ wa\n'
+
+
+def test_later_cluster_made_from_an_earlier_one():
+    assert rw.ClusterRewriter(['n d', 'nd ʒ']).rewrite_line('a n d ʒ\t4\n') == 'a ndʒ\t4\n'
+
+
+def test_same_as_baseline_merge():
+    segs = ['a', 'b', 'c', 'ab', 'bc']
+    pool = segs+['abc', 'cc']
+    rng = random.Random(1)
+    for _ in range(20000):
+        clustlist = []
+        for _ in range(rng.randint(1, 4)):
+            clust = ' '.join(rng.choice(pool) for _ in range(rng.choice([2, 2, 3])))
+            if clust not in clustlist:
+                clustlist.append(clust)
+        line = ' '.join(rng.choice(segs) for _ in range(rng.randint(0, 9)))+rng.choice(['', ' ', '  '])+'\n'
+        assert rw.ClusterRewriter(clustlist).rewrite_line(line) == baseline_merge(clustlist, line)+'\n', (clustlist, line)
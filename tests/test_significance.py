@@ -0,0 +1,66 @@
+# coding: utf-8
+
+'''
+fisher_pvalues against scipy's Fisher's exact test, which natclasscounter.findPValue used to call for every cluster
+'''
+
+import threading
+
+import numpy as np
+import pytest
+import scipy.stats
+
+import significance as sig
+
+
+def baseline_pvalue(clustercount, allclustercounts):
+    return scipy.stats.fisher_exact([[clustercount, allclustercounts-clustercount], [0, allclustercounts]])[1]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    sig.clear_cache()
+    yield
+    sig.clear_cache()
+
+
+def test_same_as_scipy():
+    pairs = [(0, 10), (1, 1), (3, 21003), (1, 21003), (484, 21003), (7, 40), (40, 40), (2, 5)]
+    counts = [c for (c, t) in pairs]
+    totals = [t for (c, t) in pairs]
+    new = sig.fisher_pvalues(counts, totals)
+    old = [baseline_pvalue(c, t) for (c, t) in pairs]
+    assert new == pytest.approx(old, rel=1e-9, abs=1e-300)
+
+
+def test_cached_values_are_the_same():
+    first = sig.fisher_pvalues([5, 2, 5, 9], 300)
+    second = sig.fisher_pvalues([9, 5, 2], 300)
+    assert second.tolist() == [first[3], first[0], first[1]]
+
+
+def test_threads(monkeypatch):
+    #a small cache, so the threads keep evicting each other's entries
+    monkeypatch.setattr(sig, 'CACHESIZE', 50)
+    rng = np.random.default_rng(3)
+    jobs = [rng.integers(0, 200, size=300) for _ in range(8)]
+    expected = [sig.compute_pvalues(counts, np.full(len(counts), 1000)) for counts in jobs]
+    results = [None]*len(jobs)
+    errors = []
+
+    def work(k):
+        try:
+            for _ in range(20):
+                results[k] = sig.fisher_pvalues(jobs[k], 1000)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(k,)) for k in range(len(jobs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    for (new, old) in zip(results, expected):
+        assert new.tolist() == old.tolist()
+    assert len(sig._cache) <= 50
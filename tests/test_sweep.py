@@ -0,0 +1,41 @@
+# coding: utf-8
+
+'''
+a sweep ends each setting with the inventory that running complexify with that setting ends with
+'''
+
+import contextlib
+import os
+
+import compseg
+import pynatclasses as pnc
+import sweep
+
+from conftest import DATADIR, BASELINEDIR
+
+LD = os.path.join(DATADIR, 'yidiny', 'LearningData.txt')
+FEATS = os.path.join(DATADIR, 'yidiny', 'Features.txt')
+
+
+def test_same_as_complexify(tmp_path):
+    thresholds = [0.5, 1.0, 2.0]
+    alphas = [0.001, 0.05]
+    rows = sweep.sweep(LD, FEATS, thresholds, alphas)
+    assert [(x['threshold'], x['alpha']) for x in rows] == [(t, a) for t in thresholds for a in alphas]
+    for row in rows:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            (featlines, counts) = compseg.complexify(ld=LD, feats=FEATS, outdir=str(tmp_path), threshold=row['threshold'], alpha=row['alpha'], inmemory=True)
+        assert row['inventory'] == [line[0] for line in featlines[1]], (row['threshold'], row['alpha'])
+
+
+def test_baseline_setting(tmp_path):
+    (row,) = sweep.sweep(LD, FEATS, [1.0], [0.05])
+    oldsegs = [line[0] for line in pnc.read_feat_file(FEATS)[1]]
+    finalsegs = [line[0] for line in pnc.read_feat_file(os.path.join(BASELINEDIR, 'yidiny', 'iteration2', 'Features.txt'))[1]]
+    assert row['inventory'] == finalsegs
+    assert row['segments'] == [x for x in finalsegs if not x in oldsegs]
+    assert row['iterations'] == 2
+    outpath = str(tmp_path/'sweep.txt')
+    sweep.write_table([row], outpath)
+    with open(outpath, 'r', encoding='utf-8') as f:
+        assert f.read().splitlines()[1] == '\t'.join(['1.0', '0.05', '2', ', '.join(row['segments']), ' '.join(finalsegs)])
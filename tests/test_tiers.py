@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+'''
+tiers are kept in memory, and only saved on disk when a cachedir is given. they have to keep working when they cannot be saved there. run with python -m pytest from the top of the repository
+'''
+
+import os
+import stat
+import tempfile
+import unittest
+
+import tiers as tr
+import oecalc as oe
+
+
+class UnwritableTierDir(unittest.TestCase):
+
+    def setUp(self):
+        tr.clear_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ld = os.path.join(self.tmp.name, 'LearningData.txt')
+        self.cachedir = os.path.join(self.tmp.name, 'tiers')
+        with open(self.ld, 'w', encoding='utf-8') as f:
+            f.write('p a t e k i\nt a k a\ns e p i\n')
+
+    def tearDown(self):
+        os.chmod(self.tmp.name, stat.S_IRWXU)
+        tr.clear_cache()
+        self.tmp.cleanup()
+
+    def test_file_called_tiers(self):
+        with open(self.cachedir, 'w') as f:
+            f.write('not a directory\n')
+        tier = tr.tier(self.ld, 'a e i', self.cachedir)
+        self.assertEqual(tier.word(0), ['a', 'e', 'i'])
+        self.assertEqual(oe.OEcalc(filepath=self.ld, segs='a e', local=False)['a e']['observed'], 1)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['LearningData.txt', 'tiers'])
+
+    @unittest.skipIf(hasattr(os, 'geteuid') and os.geteuid() == 0, 'root can write to read-only directories')
+    def test_read_only_data_dir(self):
+        os.chmod(self.tmp.name, stat.S_IRUSR | stat.S_IXUSR)
+        tier = tr.tier(self.ld, 'p t k', self.cachedir)
+        self.assertEqual(tier.word(1), ['t', 'k'])
+        self.assertEqual(os.listdir(self.tmp.name), ['LearningData.txt'])
+
+    def test_no_half_written_tier_left(self):
+        cachedir = os.path.join(self.tmp.name, 'cache')
+        os.mkdir(cachedir)
+        #a file where compile_corpus needs to make a directory
+        corpus = oe.ci.load(self.ld)
+        proj = tr.projection('a e i')
+        path = os.path.join(cachedir, 'tier')
+        with open(path+'.tmp'+str(os.getpid()), 'w') as f:
+            f.write('in the way\n')
+        self.assertFalse(tr.save_tier(tr.project(corpus, proj.segs), proj, path))
+        self.assertFalse(os.path.exists(path))
+
+    def test_saved_tier_is_reused(self):
+        first = tr.tier(self.ld, 'a e i', self.cachedir)
+        self.assertEqual(len(os.listdir(self.cachedir)), 1)
+        tr.clear_cache()
+        second = tr.tier(self.ld, 'a e i', self.cachedir)
+        self.assertEqual(list(second.words()), list(first.words()))
+
+
+class MemoryOnly(unittest.TestCase):
+
+    def setUp(self):
+        tr.clear_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ld = os.path.join(self.tmp.name, 'LearningData.txt')
+        with open(self.ld, 'w', encoding='utf-8') as f:
+            f.write('p a t e k i\nt a k a\ns e p i\n')
+
+    def tearDown(self):
+        tr.clear_cache()
+        self.tmp.cleanup()
+
+    def test_nothing_written_by_default(self):
+        tr.tier(self.ld, 'a e i')
+        oe.OEcalc(filepath=self.ld, segs='p t k', local=False)
+        oe.trigramOEcalc(self.ld, 'a e i', 'a e i')
+        self.assertEqual(os.listdir(self.tmp.name), ['LearningData.txt'])
+
+    def test_cached_tier_does_not_read_the_corpus(self):
+        first = tr.tier(self.ld, 'a e i')
+        load = tr.ci.load
+        def refuse(source):
+            raise AssertionError('the corpus was read again')
+        tr.ci.load = refuse
+        try:
+            self.assertIs(tr.tier(self.ld, 'i e a'), first)
+        finally:
+            tr.ci.load = load
+
+    def test_changed_file_gets_a_new_tier(self):
+        self.assertEqual(tr.tier(self.ld, 'a e i').word(0), ['a', 'e', 'i'])
+        with open(self.ld, 'w', encoding='utf-8') as f:
+            f.write('p i t a k u e\n')
+        self.assertEqual(tr.tier(self.ld, 'a e i').word(0), ['i', 'a', 'e'])
@@ -0,0 +1,71 @@
+# coding: utf-8
+
+'''
+every artifacts mode writes the same files as writing them straight away
+'''
+
+import os
+
+import pytest
+
+import writebehind as wb
+
+
+def write_lines(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line+'\n')
+
+
+def fail(path):
+    raise OSError('cannot write '+path)
+
+
+def contents(root):
+    out = {}
+    for (path, dirs, files) in os.walk(str(root)):
+        for fname in files:
+            with open(os.path.join(path, fname), 'r', encoding='utf-8') as f:
+                out[os.path.relpath(os.path.join(path, fname), str(root))] = f.read()
+    return out
+
+
+def run(root, mode):
+    writer = wb.IterationWriter(mode)
+    for step in (1, 2, 3):
+        lines = ['p a t a', 'iteration %d' % step]
+        writer.write(os.path.join(str(root), 'iteration%d' % step, 'LearningData.txt'), write_lines, lines)
+        writer.write(os.path.join(str(root), 'iteration%d' % step, 'Features.txt'), write_lines, lines[::-1])
+    return writer
+
+
+@pytest.mark.parametrize('mode', ['thread', 'end'])
+def test_same_files_as_sync(tmp_path, mode):
+    run(tmp_path/'sync', 'sync').close()
+    writer = run(tmp_path/mode, mode)
+    if mode == 'end':
+        assert not os.path.exists(str(tmp_path/mode))
+    writer.close()
+    assert contents(tmp_path/mode) == contents(tmp_path/'sync')
+    assert len(contents(tmp_path/'sync')) == 6
+
+
+def test_none_writes_nothing(tmp_path):
+    run(tmp_path/'none', None).close()
+    assert not os.path.exists(str(tmp_path/'none'))
+
+
+@pytest.mark.parametrize('mode', ['thread', 'end'])
+def test_error_comes_back_on_close(tmp_path, mode):
+    writer = wb.IterationWriter(mode)
+    writer.write(str(tmp_path/'a.txt'), fail)
+    writer.write(str(tmp_path/'b.txt'), write_lines, ['still written'])
+    with pytest.raises(OSError):
+        writer.close()
+    if mode == 'thread':
+        assert os.path.isfile(str(tmp_path/'b.txt'))
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        wb.IterationWriter('later')